@@ -1,8 +1,16 @@
-from .pybroom import tidy, glance, augment
+from .pybroom import tidy, glance, augment, covariance_array
 from .utils import tidy_to_dict, dict_to_tidy  # noqa 401
+from .pipeline import fit_many, iter_fit_many
+from .record import FitRecord
+from .batch import batch_ols, batch_least_squares
+from .aio import atidy, aglance, aaugment, aiter_chunks
+from .cache import TidyCache
 from ._version import get_versions
 
-__all__ = ['tidy', 'glance', 'augment']
+__all__ = ['tidy', 'glance', 'augment', 'fit_many', 'iter_fit_many',
+           'FitRecord', 'batch_ols', 'batch_least_squares',
+           'covariance_array', 'atidy', 'aglance', 'aaugment',
+           'aiter_chunks', 'TidyCache']
 __version__ = get_versions()['version']
 
 
@@ -0,0 +1,223 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+This module contains asyncio entry points to tidy fit results which are
+not available yet:
+
+- :func:`atidy`, :func:`aglance` and :func:`aaugment`
+- :func:`aiter_chunks`
+
+The input is a single awaitable or a collection (list, dict, nested
+dict/list, pandas.Series or object ndarray) whose elements are awaitables
+(coroutines, `asyncio.Future`), `concurrent.futures.Future` or fit results
+already available. Each result is tidied in a worker thread (the event
+loop is not blocked) as soon as it completes, and the output has the same
+key columns of :func:`pybroom.tidy` on the collection of results. With
+`batch=True`, all the results are awaited first and then tidied together
+with the batch implementations of :func:`pybroom.tidy`.
+
+Example:
+    Tidy fits running in a process pool from a coroutine::
+
+        >>> loop = asyncio.get_running_loop()
+        >>> futures = {name: loop.run_in_executor(pool, fit, data)
+        ...            for name, data in datasets.items()}
+        >>> df = await br.aglance(futures, var_names='dataset')
+"""
+import asyncio
+from concurrent.futures import Future
+from functools import partial
+import inspect
+import numpy as np
+from .pybroom import glance, tidy, augment
+from .pybroom import (_check_tidy_kwargs, _is_multi, _keyed_output,
+                      _leaves_output, _prepare_collection,
+                      _wide_columns_output)
+from .utils import _concat_columns
+
+_FUNCS = {'glance': glance, 'tidy': tidy, 'augment': augment}
+
+
+async def _await(leaf):
+    """Return the result of `leaf` (an awaitable, a Future or a result)."""
+    if isinstance(leaf, Future):
+        return await asyncio.wrap_future(leaf)
+    if inspect.isawaitable(leaf):
+        return await leaf
+    return leaf
+
+
+async def _indexed(index, leaf):
+    return index, await _await(leaf)
+
+
+async def _leaf_columns(func, index, leaf, executor, kwargs):
+    """Await `leaf` and tidy it in `executor` as soon as it completes."""
+    result = await _await(leaf)
+    loop = asyncio.get_running_loop()
+    columns = await loop.run_in_executor(
+        executor, partial(func, result, output='dict', **kwargs))
+    return index, columns
+
+
+def _pop_layout(func, kwargs):
+    """Pop the `layout` (and `fields`) arguments of `tidy` from `kwargs`.
+
+    Returns:
+        The tuple `(layout, wide_kws)` where `wide_kws` are the arguments
+        of :func:`pybroom.pybroom._wide_columns_output`.
+    """
+    if func is not tidy:
+        return 'long', {}
+    layout = kwargs.pop('layout', 'long')
+    _check_tidy_kwargs(layout, kwargs)
+    wide_kws = {}
+    if layout == 'wide' and 'fields' in kwargs:
+        wide_kws['fields'] = kwargs.pop('fields')
+    return layout, wide_kws
+
+
+def _columns_output(columns_list, levels, is_dict, var_names, as_index,
+                    output, compact, layout, wide_kws):
+    """Join the columns of each result adding the key columns."""
+    if layout == 'wide':
+        return _wide_columns_output(columns_list, levels, is_dict,
+                                    var_names, as_index=as_index,
+                                    output=output, compact=compact,
+                                    **wide_kws)
+    lengths = np.array([len(next(iter(c.values()))) if c else 0
+                        for c in columns_list], dtype=np.intp)
+    return _keyed_output(_concat_columns(columns_list), levels, lengths,
+                         is_dict, var_names, as_index, output, compact)
+
+
+async def _atidy(func, results, var_names=None, as_index=False,
+                 output='dataframe', compact=False, executor=None,
+                 batch=False, **kwargs):
+    loop = asyncio.get_running_loop()
+    if not _is_multi(results):
+        result = await _await(results)
+        return await loop.run_in_executor(
+            executor, partial(func, result, output=output, compact=compact,
+                              **kwargs))
+    leaves, levels, is_dict, var_names = _prepare_collection(
+        results, var_names, as_index, output)
+    if batch:
+        leaves = await asyncio.gather(*[_await(leaf) for leaf in leaves])
+        return await loop.run_in_executor(
+            executor, partial(_leaves_output, func, leaves, levels, is_dict,
+                              var_names, as_index, output, compact,
+                              **kwargs))
+    layout, wide_kws = _pop_layout(func, kwargs)
+    columns_list = [None] * len(leaves)
+    tasks = [_leaf_columns(func, i, leaf, executor, kwargs)
+             for i, leaf in enumerate(leaves)]
+    for task in asyncio.as_completed(tasks):
+        index, columns = await task
+        columns_list[index] = columns
+    return await loop.run_in_executor(
+        executor, partial(_columns_output, columns_list, levels, is_dict,
+                          var_names, as_index, output, compact, layout,
+                          wide_kws))
+
+
+async def atidy(results, var_names=None, **kwargs):
+    """Asyncio version of :func:`pybroom.tidy` for results not ready yet.
+
+    Arguments:
+        results: an awaitable (or `concurrent.futures.Future`) returning a
+            fit result, or a collection of them (list, dict, nested
+            dict/list, pandas.Series or ndarray). Elements which are fit
+            results are tidied directly.
+        var_names (string or list): name(s) of the key column(s), see
+            :func:`pybroom.tidy`.
+        executor (`concurrent.futures.Executor` or None): executor used to
+            run the tidying functions. If None, the default executor of
+            the event loop (a thread pool) is used.
+        batch (bool): if True, wait for all the results and tidy them in
+            a single call in the executor, using the batch implementations
+            of :func:`pybroom.tidy` when available. No result is tidied
+            before the slowest one completes. Default False.
+        **kwargs: additional arguments passed to :func:`pybroom.tidy`
+            (e.g. `as_index`, `output`, `compact`, `layout` or
+            `param_names`).
+
+    Returns:
+        The same output of :func:`pybroom.tidy` on the collection of the
+        awaited results. Each result is tidied as soon as it completes
+        (unless `batch` is True) and the output is assembled, in key
+        order, when all the results are tidied.
+    """
+    return await _atidy(tidy, results, var_names, **kwargs)
+
+
+async def aglance(results, var_names=None, **kwargs):
+    """Asyncio version of :func:`pybroom.glance`, see :func:`atidy`."""
+    return await _atidy(glance, results, var_names, **kwargs)
+
+
+async def aaugment(results, var_names=None, **kwargs):
+    """Asyncio version of :func:`pybroom.augment`, see :func:`atidy`."""
+    return await _atidy(augment, results, var_names, **kwargs)
+
+
+async def aiter_chunks(results, what='glance', chunksize=64, var_names=None,
+                       as_index=False, output='dataframe', compact=False,
+                       executor=None, batch=False, **kwargs):
+    """Asynchronously iterate over the tidy output in chunks of results.
+
+    Results are tidied as soon as they complete (see :func:`atidy`) and a
+    chunk is yielded every `chunksize` completed results (and at the end).
+
+    Arguments:
+        results: an awaitable or a collection of awaitables, see
+            :func:`atidy`. A single awaitable yields a single chunk with
+            the output of the tidying function for its result.
+        what (string): name of the tidying function, one of `'glance'`,
+            `'tidy'` or `'augment'`.
+        chunksize (int): number of results in each chunk.
+        batch (bool): if True, the results of each chunk are tidied
+            together with the batch implementations (see :func:`atidy`).
+        var_names, as_index, output, compact, executor, **kwargs: see
+            :func:`atidy`.
+
+    Yields:
+        The output of the tidying function for the results of each chunk,
+        in completion order. The key columns identify the results as in
+        the output of :func:`atidy` for the whole collection.
+    """
+    func = _FUNCS[what]
+    loop = asyncio.get_running_loop()
+    if not _is_multi(results):
+        result = await _await(results)
+        yield await loop.run_in_executor(
+            executor, partial(func, result, output=output, compact=compact,
+                              **kwargs))
+        return
+    leaves, levels, is_dict, var_names = _prepare_collection(
+        results, var_names, as_index, output)
+    if batch:
+        tasks = [_indexed(i, leaf) for i, leaf in enumerate(leaves)]
+    else:
+        layout, wide_kws = _pop_layout(func, kwargs)
+        tasks = [_leaf_columns(func, i, leaf, executor, kwargs)
+                 for i, leaf in enumerate(leaves)]
+    indices, chunk = [], []
+    for n_done, task in enumerate(asyncio.as_completed(tasks), 1):
+        index, value = await task
+        indices.append(index)
+        chunk.append(value)
+        if len(indices) == chunksize or n_done == len(tasks):
+            chunk_levels = [(codes[indices], categories)
+                            for codes, categories in levels]
+            if batch:
+                assemble = partial(_leaves_output, func, chunk, chunk_levels,
+                                   is_dict, var_names, as_index, output,
+                                   compact, **kwargs)
+            else:
+                assemble = partial(_columns_output, chunk, chunk_levels,
+                                   is_dict, var_names, as_index, output,
+                                   compact, layout, wide_kws)
+            yield await loop.run_in_executor(executor, assemble)
+            indices, chunk = [], []
@@ -0,0 +1,499 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+This module contains vectorized "batch" fitting engines, solving many small
+independent problems at once with stacked NumPy linear algebra:
+
+- :func:`batch_ols`: ordinary least squares regressions, one for each group
+  of rows in a long-form DataFrame.
+- :func:`batch_least_squares`: nonlinear least squares (Levenberg-Marquardt)
+  for many problems with the same model, solved in lockstep.
+
+The output has the same columns returned by pybroom functions on the
+equivalent fit result objects (e.g. :func:`pybroom.glance` on statsmodels
+OLS results) plus the key column(s) identifying each group. Since no fit
+result object is created, the per-fit Python overhead is negligible.
+"""
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .pybroom import glance, tidy, augment
+from .pybroom import _as_list_of_strings_copy, _index_levels, _keyed_output
+from .utils import (_as_what_list, _check_output, _covariance_from_jac,
+                    _leverage_from_jac, _stack_point_arrays)
+
+
+def _group_rows(data, groups):
+    """Group the rows of `data` by the columns `groups`.
+
+    Returns:
+        A tuple `(order, codes, counts, index)` where `order` sorts the rows
+        by group (stable), `codes` is the group of each sorted row,
+        `counts` the number of rows in each group and `index` the
+        `pandas.Index` of the (sorted) group keys.
+    """
+    grouped = data.groupby(groups, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=grouped.ngroups)
+    index = grouped.size().index
+    return order, codes[order], counts, index
+
+
+def _pad_groups(values, codes, counts):
+    """Stack the rows of each group in a zero-padded 3D array.
+
+    Arguments:
+        values (2D array): rows sorted by group, shape `(n_rows, n_cols)`.
+        codes (1D array): group of each row.
+        counts (1D array): number of rows in each group.
+
+    Returns:
+        Array of shape `(n_groups, max(counts), n_cols)`.
+    """
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pos = np.arange(len(codes)) - starts[codes]
+    padded = np.zeros((len(counts), counts.max(), values.shape[1]))
+    padded[codes, pos] = values
+    return padded, pos
+
+
+def batch_ols(data, y, x, groups, what=('glance', 'tidy'), intercept=True,
+              var_names=None, as_index=False, output='dataframe',
+              compact=False):
+    """Fit an OLS regression for each group of rows in `data`.
+
+    All the regressions are solved at once with a stacked QR decomposition.
+    Groups are zero-padded to the size of the largest group, which leaves
+    the least-squares solution unchanged. Note that the padded arrays use
+    memory proportional to `n_groups * max(group size)`: with very skewed
+    group sizes, consider calling this function separately on groups of
+    similar size. For rank-deficient groups (e.g. a constant regressor or
+    fewer rows than terms) the estimates and the statistics (except the
+    degrees of freedom) are NaN.
+    The output has the same columns
+    of :func:`pybroom.statsmodels.ols.glance_statsmodels`,
+    :func:`pybroom.statsmodels.ols.tidy_statsmodels` and
+    :func:`pybroom.statsmodels.ols.augment_statsmodels` for the equivalent
+    ``smf.ols('y ~ x1 + x2 ...', data=group_data).fit()`` results.
+
+    Arguments:
+        data (pandas.DataFrame): long-form DataFrame with all the groups.
+        y (string): name of the column containing the dependent variable.
+        x (string or list of strings): name(s) of the column(s) containing
+            the regressors.
+        groups (string or list of strings): name(s) of the column(s)
+            identifying the groups. Each group is fitted separately.
+        what (string or sequence of strings): outputs to compute. Valid
+            names are `'glance'`, `'tidy'` and `'augment'`.
+        intercept (bool): if True, add an intercept term (`'Intercept'`).
+        var_names (string, list or None): name(s) of the key column(s).
+            If None, use the names in `groups`.
+        as_index (bool): if True, return the keys as a `pandas.MultiIndex`.
+        output (string): type of the returned objects, one of
+            `'dataframe'`, `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean DataFrames
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Returns:
+        The output for `what` when it is a string, otherwise a dict of
+        outputs with the names in `what` as keys. In `augment` output,
+        rows are sorted by group (and keep the original order within a
+        group).
+    """
+    from scipy import special
+
+    what_list = _as_what_list(what)
+    _check_output(output)
+    x = [x] if isinstance(x, str) else list(x)
+    groups = [groups] if isinstance(groups, str) else list(groups)
+    order, codes, counts, index = _group_rows(data, groups)
+    levels, is_dict, names = _index_levels(index)
+    if var_names is None:
+        var_names = names
+    var_names = [var_names] if isinstance(var_names, str) else var_names
+
+    y_values = data[y].to_numpy(dtype=float)[order]
+    x_values = data[x].to_numpy(dtype=float)[order]
+    terms = list(x)
+    design = x_values
+    if intercept:
+        terms = ['Intercept'] + terms
+        design = np.column_stack((np.ones(len(y_values)), x_values))
+    n_groups, p = len(counts), len(terms)
+    A, pos = _pad_groups(np.column_stack((design, y_values)), codes, counts)
+    X, Y = A[..., :p], A[..., p]
+
+    if X.shape[1] < p:
+        # Fewer rows than terms in all groups: pad to a square design
+        X = np.pad(X, ((0, 0), (0, p - X.shape[1]), (0, 0)))
+        Y = np.pad(Y, ((0, 0), (0, p - Y.shape[1])))
+
+    # Rank-deficient groups (e.g. a constant regressor, or fewer rows than
+    # terms) have no unique solution: their outputs are NaN
+    sv = np.linalg.svd(X, compute_uv=False)
+    tol = sv[:, :1] * np.maximum(counts, p)[:, None] * np.finfo(float).eps
+    singular = np.any(sv <= tol, axis=1)
+
+    # Stacked QR: X = Q R, beta = R^-1 Q^T y
+    Q, R = np.linalg.qr(X)
+    R[singular] = np.eye(p)
+    Qty = np.einsum('gnp,gn->gp', Q, Y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        R_inv = np.linalg.inv(R)
+        R_inv[singular] = np.nan
+        beta = np.einsum('gij,gj->gi', R_inv, Qty)
+        fitted = np.einsum('gnp,gp->gn', X, beta)
+        resid = Y - fitted
+        rss = np.sum(resid**2, axis=1)
+        nobs = counts.astype(float)
+        k_constant = 1 if intercept else 0
+        df_resid = nobs - p
+        df_model = float(p - k_constant)
+        sigma2 = rss / df_resid
+        std_error = np.sqrt(sigma2[:, None] * np.sum(R_inv**2, axis=2))
+        t_stat = beta / std_error
+        p_t = 2 * special.stdtr(df_resid[:, None], -np.abs(t_stat))
+
+    out = {}
+    if 'tidy' in what_list:
+        columns = OrderedDict()
+        columns['term'] = np.tile(np.asarray(terms, dtype=object), n_groups)
+        columns['estimate'] = beta.ravel()
+        columns['std_error'] = std_error.ravel()
+        columns['statistic'] = t_stat.ravel()
+        columns['p_value'] = p_t.ravel()
+        lengths = np.full(n_groups, p, dtype=np.intp)
+        out['tidy'] = _keyed_output(columns, levels, lengths, is_dict,
+                                    var_names, as_index, output, compact)
+    if 'glance' in what_list:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if intercept:
+                y_mean = np.sum(Y, axis=1) / nobs
+                tss = np.sum(Y**2, axis=1) - nobs * y_mean**2
+            else:
+                tss = np.sum(Y**2, axis=1)
+            r2 = 1 - rss / tss
+            adj_r2 = 1 - (nobs - k_constant) / df_resid * (1 - r2)
+            f_stat = ((tss - rss) / df_model) / sigma2
+            f_pvalue = special.fdtrc(df_model, df_resid, f_stat)
+            llf = -nobs / 2 * (np.log(2 * np.pi) + np.log(rss / nobs) + 1)
+        k = df_model + k_constant
+        columns = OrderedDict([('r_squared', r2),
+                               ('adj_r_squared', adj_r2),
+                               ('statistic', f_stat),
+                               ('p_value', f_pvalue),
+                               ('df', np.full(n_groups, df_model)),
+                               ('df_residual', df_resid),
+                               ('aic', -2 * llf + 2 * k),
+                               ('bic', -2 * llf + np.log(nobs) * k)])
+        lengths = np.ones(n_groups, dtype=np.intp)
+        out['glance'] = _keyed_output(columns, levels, lengths, is_dict,
+                                      var_names, as_index, output, compact)
+    if 'augment' in what_list:
+        columns = OrderedDict()
+        columns[y] = y_values
+        for i, name in enumerate(x):
+            columns[name] = x_values[:, i]
+        columns['_fitted'] = fitted[codes, pos]
+        columns['_se_fit'] = np.full(len(y_values), np.nan)
+        columns['_resid'] = resid[codes, pos]
+        out['augment'] = _keyed_output(columns, levels, counts, is_dict,
+                                       var_names, as_index, output, compact)
+    if isinstance(what, str):
+        return out[what]
+    return out
+
+
+_LSQ_MESSAGES = {
+    0: 'The maximum number of function evaluations is exceeded.',
+    1: '`gtol` termination condition is satisfied.',
+    2: '`ftol` termination condition is satisfied.',
+    3: '`xtol` termination condition is satisfied.',
+    4: 'Both `ftol` and `xtol` termination conditions are satisfied.'}
+
+
+class BatchResult:
+    """Results of :func:`batch_least_squares` for all the problems.
+
+    The attributes are the same of the `scipy.optimize.OptimizeResult`
+    returned by `scipy.optimize.least_squares`, stacked along the first
+    axis (one element for each problem): `x`, `cost`, `fun`, `jac`, `grad`,
+    `optimality`, `active_mask`, `nfev`, `njev`, `status`, `message` and
+    `success`.
+
+    `BatchResult` objects are accepted by :func:`pybroom.tidy`,
+    :func:`pybroom.glance` and :func:`pybroom.augment`, which return the
+    same columns as for a list of `OptimizeResult`, built from the stacked
+    arrays in one shot.
+    Indexing a `BatchResult` returns the `OptimizeResult` of one problem.
+    """
+    _fields = ('x', 'cost', 'fun', 'jac', 'grad', 'optimality',
+               'active_mask', 'nfev', 'njev', 'status', 'message', 'success')
+
+    def __init__(self, **kwargs):
+        for name in self._fields:
+            setattr(self, name, kwargs[name])
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        from scipy.optimize import OptimizeResult
+        return OptimizeResult(**{name: getattr(self, name)[i]
+                                 for name in self._fields})
+
+    def __repr__(self):
+        return '<BatchResult (%d problems, %d successful)>' % (
+            len(self), np.count_nonzero(self.success))
+
+
+def _take_args(args, index, n_problems):
+    """Select the problems in `index` from the per-problem arguments.
+
+    Arguments with ndim >= 2 and first dimension equal to `n_problems`
+    are per-problem, all the other arguments are shared.
+    """
+    return tuple(a[index] if (isinstance(a, np.ndarray) and a.ndim >= 2 and
+                              a.shape[0] == n_problems) else a
+                 for a in args)
+
+
+def _jac_2point(fun, x, f0, args):
+    """Vectorized forward finite-difference Jacobian."""
+    eps = np.sqrt(np.finfo(float).eps)
+    h = eps * np.maximum(1, np.abs(x))
+    J = np.empty(f0.shape + (x.shape[1],))
+    for j in range(x.shape[1]):
+        x_h = x.copy()
+        x_h[:, j] += h[:, j]
+        J[..., j] = (fun(x_h, *args) - f0) / h[:, j, None]
+    return J
+
+
+def batch_least_squares(fun, x0, jac=None, args=(), ftol=1e-8, xtol=1e-8,
+                        gtol=1e-8, max_nfev=None):
+    """Solve many small nonlinear least-squares problems in lockstep.
+
+    All the problems share the same model and are solved with a
+    Levenberg-Marquardt algorithm vectorized across problems: at each
+    iteration the residuals and the Jacobian of all the active problems
+    are computed with a single call to `fun` and `jac`, and the damped
+    normal equations are solved with a stacked `numpy.linalg.solve`.
+    Each problem has its own damping factor and convergence status:
+    converged problems are masked out and no longer evaluated.
+
+    Arguments:
+        fun (callable): vectorized residuals function ``fun(x, *args)``.
+            `x` has shape `(k, n_params)` and the returned array has shape
+            `(k, n_points)`, where `k` is the number of (active) problems.
+        x0 (array): initial guess, shape `(n_params,)` (the same for all
+            the problems) or `(n_problems, n_params)`.
+        jac (callable or None): vectorized Jacobian ``jac(x, *args)``
+            returning an array of shape `(k, n_points, n_params)`. If None,
+            it is estimated with forward finite differences and, as in the
+            `'lm'` method of `least_squares`, the evaluations of `fun`
+            needed for the Jacobian are counted in `nfev`.
+        args (tuple): additional arguments for `fun` and `jac`. Arrays with
+            ndim >= 2 and first dimension equal to `n_problems` (e.g. the
+            data, shape `(n_problems, n_points)`) are per-problem and are
+            sliced to the active problems. Other arguments are shared.
+        ftol, xtol, gtol (float): tolerances for the termination conditions
+            on the cost reduction, the step size and the gradient, with the
+            same meaning as in `scipy.optimize.least_squares`.
+        max_nfev (int or None): maximum number of function evaluations for
+            each problem. If None, it is 100 * n_params (times
+            n_params + 1 when `jac` is None).
+
+    Returns:
+        A :class:`BatchResult` with the results of all the problems.
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    n_problems = max((a.shape[0] for a in args
+                      if isinstance(a, np.ndarray) and a.ndim >= 2),
+                     default=x0.shape[0])
+    x = np.array(np.broadcast_to(x0, (n_problems, x0.shape[1])))
+    n_params = x.shape[1]
+    if jac is None:
+        # Finite differences: n_params evaluations of `fun` per Jacobian
+        jac_nfev = n_params
+
+        def jac_eval(x, f, args):
+            return _jac_2point(fun, x, f, args)
+    else:
+        jac_nfev = 0
+
+        def jac_eval(x, f, args):
+            return jac(x, *args)
+    if max_nfev is None:
+        max_nfev = 100 * (n_params + jac_nfev * n_params)
+
+    f = np.asarray(fun(x, *args), dtype=float)
+    J = np.asarray(jac_eval(x, f, args), dtype=float)
+    cost = 0.5 * np.sum(f**2, axis=1)
+    lam = np.full(n_problems, 1e-3)
+    nfev = np.full(n_problems, 1 + jac_nfev)
+    njev = np.ones(n_problems, dtype=int)
+    status = np.full(n_problems, -1)
+    active = np.ones(n_problems, dtype=bool)
+    while True:
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+        Ja, fa = J[idx], f[idx]
+        g = np.einsum('knp,kn->kp', Ja, fa)
+        # Problems satisfying `gtol` are frozen before taking a step
+        converged = np.max(np.abs(g), axis=1) < gtol
+        status[idx[converged]] = 1
+        active[idx[converged]] = False
+        idx, Ja, g = idx[~converged], Ja[~converged], g[~converged]
+        if idx.size == 0:
+            break
+        A = np.einsum('knp,knq->kpq', Ja, Ja)
+
+        diag = np.maximum(np.einsum('kpp->kp', A), np.finfo(float).tiny)
+        A_damped = A.copy()
+        A_damped[:, np.arange(n_params), np.arange(n_params)] += (
+            lam[idx, None] * diag)
+        with np.errstate(invalid='ignore', over='ignore'):
+            step = -np.linalg.solve(A_damped, g[..., None])[..., 0]
+        x_new = x[idx] + step
+        with np.errstate(invalid='ignore', over='ignore'):
+            f_new = np.asarray(fun(x_new, *_take_args(args, idx, n_problems)),
+                               dtype=float)
+            cost_new = 0.5 * np.sum(f_new**2, axis=1)
+        nfev[idx] += 1
+        improved = np.isfinite(cost_new) & (cost_new < cost[idx])
+        small_step = (np.linalg.norm(step, axis=1) <
+                      xtol * (xtol + np.linalg.norm(x[idx], axis=1)))
+        small_cost = improved & (cost[idx] - cost_new < ftol * cost[idx])
+        new_status = np.where(small_cost & small_step, 4,
+                              np.where(small_cost, 2,
+                                       np.where(small_step, 3, -1)))
+
+        acc = idx[improved]
+        x[acc] = x_new[improved]
+        f[acc] = f_new[improved]
+        cost[acc] = cost_new[improved]
+        lam[acc] /= 10
+        lam[idx[~improved]] *= 10
+        if acc.size > 0:
+            J[acc] = jac_eval(x[acc], f[acc],
+                              _take_args(args, acc, n_problems))
+            njev[acc] += 1
+            nfev[acc] += jac_nfev
+
+        status[idx] = new_status
+        exhausted = (new_status < 0) & (nfev[idx] >= max_nfev)
+        status[idx[exhausted]] = 0
+        active[idx[status[idx] >= 0]] = False
+
+    grad = np.einsum('knp,kn->kp', J, f)
+    return BatchResult(
+        x=x, cost=cost, fun=f, jac=J, grad=grad,
+        optimality=np.max(np.abs(grad), axis=1),
+        active_mask=np.zeros((n_problems, n_params), dtype=int),
+        nfev=nfev, njev=njev, status=status,
+        message=np.array([_LSQ_MESSAGES[s] for s in status], dtype=object),
+        success=status > 0)
+
+
+def _batch_levels(result):
+    """Key levels for the problems in a :class:`BatchResult`."""
+    n = len(result)
+    return [(np.arange(n, dtype=np.intp), pd.RangeIndex(n))], [False]
+
+
+@tidy.register(BatchResult)
+def tidy_batch(result, var_names='key', param_names=None, as_index=False,
+               output='dataframe', compact=False):
+    """Tidy parameters data from a :class:`BatchResult`.
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`tidy`. The returned columns are the
+    same as :func:`pybroom.scipy.optimize.tidy_optimize` on a list of
+    `OptimizeResult`, and the key column contains the problem index.
+
+    Arguments:
+        result (`BatchResult`): the batch result object.
+        var_names (string): name of the key column.
+        param_names (string or list of string, optional): names of the
+            fitted parameters. If ``None``, the parameters are named
+            *p0, p1, p2, ..., pn*.
+        as_index (bool): if True, return the keys as a `pandas.MultiIndex`.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Returns:
+        A DataFrame in tidy format with one row for each parameter of
+        each problem.
+    """
+    n, p = result.x.shape
+    if param_names is None:
+        param_names = ['p{}'.format(i) for i in range(p)]
+    elif isinstance(param_names, str):
+        param_names = param_names.replace(',', ' ').split()
+    names = np.asarray(param_names)
+    # Rows are sorted by parameter name
+    index = np.argsort(names, kind='stable')
+    columns = OrderedDict()
+    columns['name'] = np.tile(names[index], n)
+    columns['value'] = result.x[:, index].ravel()
+    cov = _covariance_from_jac(result.jac, result.fun)
+    stderr = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+    columns['stderr'] = stderr[:, index].ravel()
+    columns['grad'] = result.grad[:, index].ravel()
+    columns['active_mask'] = result.active_mask[:, index].ravel()
+    levels, is_dict = _batch_levels(result)
+    return _keyed_output(columns, levels, np.full(n, p, dtype=np.intp),
+                         is_dict, _as_list_of_strings_copy(var_names),
+                         as_index, output, compact)
+
+
+@glance.register(BatchResult)
+def glance_batch(result, var_names='key', as_index=False, output='dataframe',
+                 compact=False):
+    """Tidy summary statistics from a :class:`BatchResult`.
+
+    The returned columns are the same as
+    :func:`pybroom.scipy.optimize.glance_optimize` on a list of
+    `OptimizeResult`, one row for each problem. See :func:`tidy_batch`
+    for a description of the arguments.
+    """
+    columns = OrderedDict()
+    for name in ('success', 'cost', 'optimality', 'nfev', 'njev', 'status',
+                 'message'):
+        columns[name] = getattr(result, name)
+    levels, is_dict = _batch_levels(result)
+    return _keyed_output(columns, levels, np.ones(len(result), dtype=np.intp),
+                         is_dict, _as_list_of_strings_copy(var_names),
+                         as_index, output, compact)
+
+
+@augment.register(BatchResult)
+def augment_batch(result, var_names='key', x=None, data=None,
+                  leverage=False, as_index=False, output='dataframe',
+                  compact=False):
+    """Tidy residuals from a :class:`BatchResult`.
+
+    The returned columns are the same as
+    :func:`pybroom.scipy.optimize.augment_optimize` on a list of
+    `OptimizeResult`, one row for each residual of each problem.
+    `x` and `data` are either 1D arrays shared by all the problems or 2D
+    arrays with one row per problem. See :func:`tidy_batch` for a
+    description of the other arguments.
+    """
+    n, m = result.fun.shape
+    lengths = np.full(n, m, dtype=np.intp)
+    columns = _stack_point_arrays(OrderedDict([('x', x), ('data', data)]),
+                                  lengths)
+    columns['residual'] = result.fun.ravel()
+    if leverage:
+        columns['leverage'] = _leverage_from_jac(result.jac).ravel()
+    levels, is_dict = _batch_levels(result)
+    return _keyed_output(columns, levels, lengths, is_dict,
+                         _as_list_of_strings_copy(var_names), as_index,
+                         output, compact)
@@ -0,0 +1,330 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+This module contains :class:`TidyCache`, an opt-in persistent cache of the
+output of :func:`pybroom.tidy`, :func:`pybroom.glance` and
+:func:`pybroom.augment`.
+
+The output for each fit result is stored in a file in the cache directory,
+named after a hash of the content of the fit result (see
+:func:`_fingerprint`), of the pybroom version, of the tidying function
+(and of the code of the specialized function handling the result type)
+and of its arguments. When the same
+computation is requested again, for example on results unpickled from
+disk, the columns are read back from the file with memory mapping.
+
+Files are written in the Feather format when `pyarrow` is installed, and
+otherwise as NumPy ``.npy`` structured arrays. The total size of the cache
+is bounded: the least recently used files are deleted when the size
+exceeds `max_bytes`.
+
+Example:
+    Cache the output of `tidy` and `glance` for a collection of results::
+
+        >>> cache = br.TidyCache('~/.cache/pybroom', max_bytes=2**30)
+        >>> dg = cache.glance(results, var_names='dataset')
+        >>> dt = cache.tidy(results, var_names='dataset')
+"""
+from collections import OrderedDict
+from functools import partial, singledispatch
+import hashlib
+import os
+import pickle
+import tempfile
+import numpy as np
+from .pybroom import glance, tidy, augment
+from .pybroom import _is_multi, _keyed_output, _prepare_collection
+from .utils import _build_output, _concat_columns
+
+try:
+    import lmfit
+except ImportError:
+    lmfit = None
+
+_NULL = '__null__'
+
+
+@singledispatch
+def _fingerprint(result):
+    """Return bytes identifying the content of a fit result.
+
+    The default implementation pickles the whole result. Specialized
+    modules can register a cheaper implementation for a fit result type,
+    using only the data relevant to the tidying functions (e.g. the
+    parameters, the data and the independent variables).
+    """
+    return pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _array_digest(hasher, value):
+    """Update `hasher` with the content of an array (or other object)."""
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        hasher.update(str((value.dtype.str, value.shape)).encode())
+        hasher.update(np.ascontiguousarray(value).data)
+    else:
+        hasher.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _code_id(func):
+    """Identify a function by its name and code.
+
+    The bytecode, the constants, the default arguments and the values
+    captured by closures are included, so that different functions (e.g.
+    lambdas) with the same name have a different id. Callable instances
+    are identified by their class, the code of its `__call__` method and
+    the instance attributes (their repr contains a memory address which
+    changes across processes).
+    """
+    func = getattr(func, '__func__', func)  # bound methods
+    if not hasattr(func, '__qualname__'):
+        return _instance_id(func)
+    parts = [getattr(func, '__module__', None), func.__qualname__]
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        parts += [code.co_code.hex(), repr(code.co_consts),
+                  repr(getattr(func, '__defaults__', None))]
+        for cell in getattr(func, '__closure__', None) or ():
+            try:
+                parts.append(pickle.dumps(cell.cell_contents).hex())
+            except Exception:
+                parts.append(repr(cell.cell_contents))
+    return '\n'.join(map(str, parts)).encode()
+
+
+def _instance_id(func):
+    """Identify a callable instance, see :func:`_code_id`."""
+    cls = type(func)
+    parts = [cls.__module__, cls.__qualname__,
+             getattr(func, '__name__', None)]  # e.g. NumPy ufuncs
+    if isinstance(func, partial):
+        parts += [_code_id(func.func).hex(),
+                  pickle.dumps((func.args, func.keywords)).hex()]
+    call = getattr(cls, '__call__', None)
+    if hasattr(call, '__code__'):
+        parts.append(_code_id(call).hex())
+    try:
+        parts.append(pickle.dumps(vars(func)).hex())
+    except Exception:
+        pass  # no instance attributes or not picklable
+    return '\n'.join(map(str, parts)).encode()
+
+
+def _implementation_id(func, result):
+    """Identify the specialized function (and its code) handling `result`.
+    """
+    return _code_id(func.dispatch(type(result)))
+
+
+if lmfit is not None:
+    def _model_id(model):
+        """Identify a lmfit `Model` by its description and functions."""
+        return (repr(model).encode() +
+                b''.join(_code_id(c.func) for c in model.components))
+
+    @_fingerprint.register(lmfit.model.ModelResult)
+    @_fingerprint.register(lmfit.minimizer.MinimizerResult)
+    def _fingerprint_lmfit(result):
+        """Hash the content of a lmfit result.
+
+        Models and functions are identified by their description and code,
+        since they are not pickled to the same bytes after a pickle
+        round-trip.
+        """
+        hasher = hashlib.sha256()
+        for name, value in sorted(vars(result).items()):
+            hasher.update(name.encode())
+            if isinstance(value, lmfit.minimizer.MinimizerResult):
+                value = _fingerprint_lmfit(value)
+            elif isinstance(value, lmfit.Model):
+                value = _model_id(value)
+            elif name == 'components':
+                value = [_model_id(c) for c in value]
+            elif callable(value):
+                value = _code_id(value)
+            _array_digest(hasher, value)
+        return hasher.digest()
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow.feather  # noqa F401
+    except ImportError:
+        return False
+    return True
+
+
+class TidyCache:
+    """Persistent on-disk cache of tidy outputs of fit results.
+
+    Arguments:
+        directory (string): path of the cache directory (created if it
+            does not exist).
+        max_bytes (int or None): maximum total size of the cached files.
+            When exceeded, the least recently used files are deleted.
+            If None, the size is not bounded.
+        format (string or None): `'feather'` (requires `pyarrow`) or
+            `'npy'`. If None, `'feather'` is used when `pyarrow` is
+            installed, otherwise `'npy'`.
+
+    The methods :meth:`tidy`, :meth:`glance` and :meth:`augment` accept
+    the same arguments of the corresponding pybroom functions.
+    """
+    def __init__(self, directory, max_bytes=2**30, format=None):
+        if format is None:
+            format = 'feather' if _has_pyarrow() else 'npy'
+        if format not in ('feather', 'npy'):
+            raise ValueError("`format` must be 'feather' or 'npy'.")
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_bytes = max_bytes
+        self.format = format
+        from . import __version__
+        self._version = __version__
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __repr__(self):
+        return '<TidyCache %r (%s)>' % (self.directory, self.format)
+
+    def tidy(self, results, var_names=None, **kwargs):
+        """Cached version of :func:`pybroom.tidy`."""
+        return self._call(tidy, results, var_names, **kwargs)
+
+    def glance(self, results, var_names=None, **kwargs):
+        """Cached version of :func:`pybroom.glance`."""
+        return self._call(glance, results, var_names, **kwargs)
+
+    def augment(self, results, var_names=None, **kwargs):
+        """Cached version of :func:`pybroom.augment`."""
+        return self._call(augment, results, var_names, **kwargs)
+
+    def clear(self):
+        """Delete all the files in the cache."""
+        for entry in self._entries():
+            os.remove(entry.path)
+
+    def size(self):
+        """Total size in bytes of the files in the cache."""
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _call(self, func, results, var_names=None, as_index=False,
+              output='dataframe', compact=False, **kwargs):
+        if not _is_multi(results):
+            columns = self._columns(func, results, kwargs)
+            self._evict()
+            return _build_output(columns, output, compact)
+        leaves, levels, is_dict, var_names = _prepare_collection(
+            results, var_names, as_index, output)
+        columns_list = [self._columns(func, res, kwargs) for res in leaves]
+        self._evict()
+        lengths = np.array([len(next(iter(c.values()))) if c else 0
+                            for c in columns_list], dtype=np.intp)
+        return _keyed_output(_concat_columns(columns_list), levels, lengths,
+                             is_dict, var_names, as_index, output, compact)
+
+    def _key(self, func, result, kwargs):
+        hasher = hashlib.sha256()
+        hasher.update(self._version.encode())
+        hasher.update(func.__name__.encode())
+        hasher.update(_implementation_id(func, result))
+        for name, value in sorted(kwargs.items()):
+            hasher.update(name.encode())
+            _array_digest(hasher, value)
+        hasher.update(_fingerprint(result))
+        return hasher.hexdigest()
+
+    def _columns(self, func, result, kwargs):
+        """Columns of `func(result, output='dict')`, read from the cache
+        when available."""
+        path = os.path.join(self.directory,
+                            self._key(func, result, kwargs) + '.' +
+                            self.format)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # mark as recently used
+                return _read(path, self.format)
+            except FileNotFoundError:
+                pass  # evicted by another process, compute again
+        columns = func(result, output='dict', **kwargs)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            _write(tmp_path, columns, self.format)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return columns
+
+    def _entries(self):
+        suffix = '.' + self.format
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(suffix)]
+
+    def _evict(self):
+        """Delete the least recently used files exceeding `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        entries = [(entry.stat(), entry.path) for entry in self._entries()]
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda e: e[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= stat.st_size
+
+
+def _write(path, columns, format):
+    if format == 'feather':
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        table = pa.table(OrderedDict(
+            (name, pa.array(np.asarray(col).tolist()
+                            if np.asarray(col).dtype == object else col))
+            for name, col in columns.items()))
+        feather.write_feather(table, path, compression='uncompressed')
+        return
+    # Strings are stored as fixed-width unicode, with a mask for None
+    fields, arrays = [], []
+    for name, col in columns.items():
+        col = np.asarray(col)
+        if col.dtype == object:
+            null = np.array([v is None for v in col], dtype=bool)
+            if all(isinstance(v, str) for v in col[~null]):
+                col = np.where(null, '', col).astype(str)
+                fields.append((_NULL + name, bool))
+                arrays.append(null)
+        fields.append((name, col.dtype))
+        arrays.append(col)
+    n = len(arrays[0]) if arrays else 0
+    out = np.empty(n, dtype=fields)
+    for (name, _), values in zip(fields, arrays):
+        out[name] = values
+    with open(path, 'wb') as f:
+        np.save(f, out, allow_pickle=out.dtype.hasobject)
+
+
+def _read(path, format):
+    columns = OrderedDict()
+    if format == 'feather':
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
+        for name, col in zip(table.column_names, table.columns):
+            columns[name] = col.to_numpy(zero_copy_only=False)
+        return columns
+    try:
+        array = np.load(path, mmap_mode='r')
+    except ValueError:
+        # Object columns (other than strings) are pickled
+        array = np.load(path, allow_pickle=True)
+    names = array.dtype.names or ()
+    for name in names:
+        if name.startswith(_NULL):
+            continue
+        col = array[name]
+        if _NULL + name in names:
+            values = np.empty(len(col), dtype=object)
+            values[:] = col.tolist()
+            values[array[_NULL + name]] = None
+            col = values
+        columns[name] = col
+    return columns
@@ -1,12 +1,19 @@
 from collections import OrderedDict
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import lmfit
 from .. import glance, tidy, augment
+from ..pybroom import _augment_many, _covariance, _tidy_many
+from ..utils import (_build_output, _concat_columns, _covariance_columns,
+                     _grid_columns, _n_workers, _point_arrays,
+                     _stack_point_arrays, decimation_index)
+from .posterior import tidy_posterior
 
 
 @tidy.register(lmfit.model.ModelResult)
 @tidy.register(lmfit.minimizer.MinimizerResult)
-def tidy_lmfit(result):
+def tidy_lmfit(result, output='dataframe', compact=False, what='parameters',
+               conf_int=None, n_jobs=1, **kwargs):
     """Tidy parameters from lmfit's  `ModelResult` or `MinimizerResult`.
 
     Normally this function is not called directly but invoked by the
@@ -14,6 +21,31 @@ def tidy_lmfit(result):
 
     Arguments:
         result (`ModelResult` or `MinimizerResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        what (string): `'parameters'` (default), `'covariance'`,
+            `'posterior'` or `'grid'`. `'covariance'` returns one row for
+            each pair of varied parameters `(param_i, param_j)` in the
+            upper triangle of `result.covar` (diagonal included) with
+            columns `cov` and `corr`. `'posterior'` returns the samples of
+            the chain of `Minimizer.emcee` results, see
+            :func:`pybroom.lmfit.posterior.tidy_posterior`. `'grid'`
+            returns the grid of `method='brute'` results (`brute_grid` and
+            `brute_Jout`), one row per grid point with a column for each
+            varied parameter and the column `fun`.
+        conf_int (list or None): if not None, a list of sigma levels
+            (e.g. ``[1, 2]``) for which the confidence interval of each
+            varied parameter is computed with `lmfit.conf_interval`.
+            Only supported for `ModelResult`.
+        n_jobs (int): number of worker processes used to compute the
+            confidence intervals, one task per parameter. Negative values
+            are relative to the number of CPUs (-1 means all the CPUs).
+        **kwargs: additional arguments for `what='posterior'` (`burn`,
+            `thin`, `quantiles`, `sink` and `chunksize`), see
+            :func:`pybroom.lmfit.posterior.tidy_posterior`. `sink` is not
+            supported when tidying a collection of results.
 
     Returns:
         A DataFrame in tidy format with one row for each parameter.
@@ -30,22 +62,140 @@ def tidy_lmfit(result):
           optimization.
         - `expr` (string): constraint expression for the parameter.
         - `stderr` (float): standard error for the parameter.
+        - `ci_lower_<s>sigma`, `ci_upper_<s>sigma` (float): bounds of the
+          confidence interval for each sigma level `s` in `conf_int`
+          (NaN for parameters not varied).
     """
-    params_attrs = ['name', 'value', 'min', 'max', 'vary', 'expr', 'stderr']
-    columns = params_attrs + ['init_value']
-    d = pd.DataFrame(index=range(result.nvarys), columns=columns)
-    for i, (name, param) in enumerate(sorted(result.params.items())):
-        for p in params_attrs:
-            d.loc[i, p] = getattr(param, p)
-        # Derived parameters may not have init value
-        if name in result.init_values:
-            d.loc[i, 'init_value'] = result.init_values[name]
-    return d.apply(pd.to_numeric, errors='ignore')
+    if what == 'posterior':
+        return tidy_posterior(result, output=output, compact=compact,
+                              **kwargs)
+    if kwargs:
+        msg = 'Unexpected arguments %s (only valid for `what="posterior"`).'
+        raise TypeError(msg % ', '.join(kwargs))
+    if what == 'covariance':
+        columns = _covariance_columns(*_covariance_lmfit(result))
+        return _build_output(columns, output, compact)
+    elif what == 'grid':
+        if getattr(result, 'brute_grid', None) is None:
+            raise ValueError('The fit result has no `brute_grid`.')
+        columns = _grid_columns(result.brute_grid, result.brute_Jout,
+                                result.var_names)
+        return _build_output(columns, output, compact)
+    elif what != 'parameters':
+        raise ValueError("`what` must be 'parameters', 'covariance', "
+                         "'posterior' or 'grid'.")
+    columns = _tidy_columns(result)
+    if conf_int is not None:
+        ci = _conf_intervals([result], conf_int, n_jobs)[0]
+        columns.update(_conf_int_columns(columns['name'], ci, conf_int))
+    return _build_output(columns, output, compact)
+
+
+def _tidy_columns(result):
+    """Columns of :func:`tidy_lmfit` for the parameters."""
+    params = sorted(result.params.items())
+    columns = OrderedDict()
+    columns['name'] = [name for name, _ in params]
+    for attr in ('value', 'min', 'max'):
+        columns[attr] = np.array([getattr(p, attr) for _, p in params],
+                                 dtype=float)
+    columns['vary'] = np.array([p.vary for _, p in params], dtype=bool)
+    columns['expr'] = [p.expr for _, p in params]
+    # stderr is None when not estimated, it becomes NaN
+    columns['stderr'] = np.array([p.stderr for _, p in params], dtype=float)
+    # Derived parameters may not have init value
+    columns['init_value'] = np.array(
+        [result.init_values.get(name, np.nan) for name, _ in params],
+        dtype=float)
+    return columns
+
+
+@_tidy_many.register(lmfit.model.ModelResult)
+def _tidy_lmfit_many(result, results, what='parameters', conf_int=None,
+                     n_jobs=1, **kwargs):
+    """Tidy many `ModelResult` computing all the confidence intervals at once.
+
+    The (result, parameter) pairs of all the results are scheduled together
+    in the same pool of worker processes. Without `conf_int`, return None to
+    tidy each result separately.
+    """
+    if conf_int is None or what != 'parameters':
+        return None
+    columns_list = []
+    for res, ci in zip(results, _conf_intervals(results, conf_int, n_jobs)):
+        columns = _tidy_columns(res)
+        columns.update(_conf_int_columns(columns['name'], ci, conf_int))
+        columns_list.append(columns)
+    lengths = [len(columns['name']) for columns in columns_list]
+    return _concat_columns(columns_list), lengths
+
+
+def _conf_interval_task(result, p_name, sigmas):
+    """Confidence interval of one parameter. Executed in the workers."""
+    return lmfit.conf_interval(result, result, p_names=[p_name],
+                               sigmas=sigmas)[p_name]
+
+
+def _conf_intervals(results, sigmas, n_jobs=1):
+    """Confidence intervals of all the varied parameters of `results`.
+
+    Returns:
+        A list with a dict `{name: ci}` for each result, where `ci` is the
+        list of `(probability, value)` returned by `lmfit.conf_interval`.
+    """
+    for res in results:
+        if not isinstance(res, lmfit.model.ModelResult):
+            raise NotImplementedError(
+                '`conf_int` is only supported for lmfit `ModelResult`.')
+    sigmas = sorted(sigmas)
+    tasks = [(i, name) for i, res in enumerate(results)
+             for name in res.var_names]
+    args = [(results[i], name, sigmas) for i, name in tasks]
+    n_workers = min(_n_workers(n_jobs), max(len(tasks), 1))
+    if n_workers == 1:
+        intervals = [_conf_interval_task(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            intervals = list(executor.map(_conf_interval_task, *zip(*args)))
+    cis = [{} for _ in results]
+    for (i, name), ci in zip(tasks, intervals):
+        cis[i][name] = ci
+    return cis
+
+
+def _conf_int_columns(names, ci, sigmas):
+    """Columns `ci_lower_<s>sigma`, `ci_upper_<s>sigma` for each sigma.
+
+    `lmfit.conf_interval` returns, for each parameter, the lower bounds in
+    decreasing sigma order, the best-fit value and the upper bounds in
+    increasing sigma order.
+    """
+    sigmas = sorted(sigmas)
+    k = len(sigmas)
+    columns = OrderedDict()
+    for i, sigma in enumerate(sigmas):
+        for side, pos in (('lower', k - 1 - i), ('upper', k + 1 + i)):
+            label = 'ci_%s_%ssigma' % (side, '{:g}'.format(sigma))
+            columns[label] = np.array(
+                [ci[name][pos][1] if name in ci else np.nan
+                 for name in names], dtype=float)
+    return columns
+
+
+@_covariance.register(lmfit.model.ModelResult)
+@_covariance.register(lmfit.minimizer.MinimizerResult)
+def _covariance_lmfit(result):
+    """Return `(var_names, covar)`, covar is NaN when not estimated."""
+    names = list(result.var_names)
+    covar = getattr(result, 'covar', None)
+    if covar is None:
+        return names, np.full((len(names), len(names)), np.nan)
+    return names, np.asarray(covar, dtype=float)
 
 
 @glance.register(lmfit.model.ModelResult)
 @glance.register(lmfit.minimizer.MinimizerResult)
-def glance_lmfit(result):
+def glance_lmfit(result, output='dataframe', compact=False):
     """Tidy summary statistics from lmfit's `ModelResult` or `MinimizerResult`.
 
     Normally this function is not called directly but invoked by the
@@ -53,6 +203,10 @@ def glance_lmfit(result):
 
     Arguments:
         result (`ModelResult` or `MinimizerResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
 
     Returns:
         A DataFrame in tidy format with one row and several summary statistics
@@ -89,43 +243,363 @@ def glance_lmfit(result):
     attrs_map['ndata'] = 'num_data_points'
 
     # ModelResult has attribute `.model.name`, MinimizerResult does not
-    if not _is_modelresult(result):
-        attrs_map.pop('name')
-    d = pd.DataFrame(index=range(1), columns=attrs_map.values())
+    columns = OrderedDict()
     if _is_modelresult(result):
-        d.loc[0, attrs_map.pop('name')] = result.model.name
-    for attr_name, df_name in attrs_map.items():
-        d.loc[0, df_name] = getattr(result, attr_name)
-    # d.loc[0, 'num_components'] = len(result.components)
+        columns[attrs_map.pop('name')] = [result.model.name]
+    else:
+        attrs_map.pop('name')
+    for attr_name, col_name in attrs_map.items():
+        # Statistics may be missing (e.g. emcee with a scalar log-prob)
+        columns[col_name] = [getattr(result, attr_name, np.nan)]
+    # columns['num_components'] = [len(result.components)]
     if hasattr(result, 'kws') and result.kws is not None:
         for key, value in result.kws.items():
-            d['_'.join((result.method, key))] = value
-    return d.apply(pd.to_numeric, errors='ignore')
+            # Skip non-scalar options (e.g. emcee initial positions)
+            if value is None or np.isscalar(value):
+                columns['_'.join((result.method, key))] = [value]
+    return _build_output(columns, output, compact)
 
 
 @augment.register(lmfit.model.ModelResult)
-@augment.register(lmfit.minimizer.MinimizerResult)
-def augment_lmfit(result):
+def augment_lmfit(result, output='dataframe', compact=False, x_eval=None,
+                  max_points=None, stride=None, method='uniform'):
     """Tidy data values and fitted model from `lmfit.model.ModelResult`.
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`augment`.
+
+    Arguments:
+        result (`ModelResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        x_eval (array or None): if not None, evaluate the best-fit model
+            on these values of the independent variable instead of
+            returning the fitted data. When augmenting a collection of
+            results sharing the same model, the model is evaluated once
+            for all the results by broadcasting the parameters values
+            over an array of shape `(n_results, len(x_eval))`.
+        max_points, stride, method: decimate the returned rows, see
+            :func:`pybroom.utils.decimation_index`. Rows are selected
+            (using the fitted data) before building the output, and the
+            model components are evaluated only on the selected rows.
+            Not supported with `x_eval` (pass a shorter `x_eval` instead).
+
+    Returns:
+        A DataFrame with one row for each data point (or for each value
+        in `x_eval`) with columns `x`, `data`, `best_fit`, `residual`
+        and one column for each model component (if more than one).
+        When `x_eval` is passed, only `x`, `best_fit` and the components
+        are returned.
+
+    Note:
+        Models with more than one independent variable and N-D data
+        (e.g. images) are supported: the data and each independent
+        variable (broadcasted to the shape of the data) are raveled in
+        C order, without copies for contiguous arrays. In this case, the
+        columns of the independent variables are named as in the model
+        instead of `x`. See :func:`iter_augment_lmfit` to get the output
+        in chunks of rows.
+    """
+    if x_eval is not None:
+        _check_x_eval(max_points, stride)
+        x_eval = np.asarray(x_eval)
+        columns = OrderedDict([('x', x_eval)])
+        for name, values in _eval_model(result.model, [result.params],
+                                        x_eval).items():
+            columns[name] = values[0]
+        return _build_output(columns, output, compact)
+
+    columns, indep = _augment_arrays(result)
+    x_array = columns['x'] if 'x' in columns and len(indep) == 1 else None
+    index = decimation_index(columns['data'], x_array, max_points, stride,
+                             method)
+    if index is not None:
+        for col in columns:
+            columns[col] = columns[col][index]
+    columns.update(_components(result, columns, indep))
+    return _build_output(columns, output, compact)
+
+
+def iter_augment_lmfit(result, chunksize=2**20, output='dataframe',
+                       compact=False):
+    """Yield the output of :func:`augment_lmfit` in chunks of rows.
+
+    The raveled arrays are sliced (without copies) and the model
+    components are evaluated one chunk at a time, bounding the peak memory
+    for fits with many data points (e.g. large images).
+
+    Arguments:
+        result (`ModelResult`): the fit result object.
+        chunksize (int): number of rows in each chunk.
+        output (string): type of the returned objects, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Yields:
+        The output of `augment` for each chunk of consecutive rows.
     """
-    columns = ['x', 'data', 'best_fit', 'residual']
-    d = pd.DataFrame(index=range(result.ndata), columns=columns)
-    for col in columns[1:]:
-        d.loc[:, col] = getattr(result, col)
-
-    independent_vars = result.model.independent_vars
-    if len(independent_vars) == 1:
-        independent_var = independent_vars[0]
+    columns, indep = _augment_arrays(result)
+    size = len(columns['data'])
+    for start in range(0, size, chunksize):
+        chunk = OrderedDict((name, values[start:start + chunksize])
+                            for name, values in columns.items())
+        chunk.update(_components(result, chunk, indep))
+        yield _build_output(chunk, output, compact)
+
+
+def _augment_arrays(result):
+    """Raveled data and independent variables of a `ModelResult`.
+
+    Each independent variable passed to the fit as an array is broadcasted
+    to the shape of the data and raveled (a view for contiguous arrays).
+
+    Returns:
+        A tuple `(columns, indep)`. `columns` is an OrderedDict of 1D arrays
+        with the independent variables (`x` when only one), `data`,
+        `best_fit` and `residual`. `indep` maps the names of the
+        independent variables to the names of their columns.
+    """
+    data = np.asarray(result.data)
+    arrays = OrderedDict()
+    for name in result.model.independent_vars:
+        value = result.userkws.get(name)
+        if value is None:
+            continue
+        try:
+            arrays[name] = _ravel(value, data.shape)
+        except ValueError:
+            continue    # not an array with the shape of the data
+    if len(arrays) == 1:
+        indep = OrderedDict((name, 'x') for name in arrays)
     else:
+        indep = OrderedDict((name, name) for name in arrays)
+    columns = OrderedDict((indep[name], values)
+                          for name, values in arrays.items())
+    columns['data'] = data.ravel()
+    for col in ('best_fit', 'residual'):
+        columns[col] = _ravel(getattr(result, col), data.shape)
+    return columns, indep
+
+
+def _ravel(value, shape):
+    """Ravel `value` (flat or broadcastable to `shape`) as a 1D array."""
+    value = np.asarray(value)
+    if value.size == np.prod(shape, dtype=int):
+        return value.ravel()
+    return np.broadcast_to(value, shape).ravel()
+
+
+def _components(result, columns, indep):
+    """Evaluate the model components on the rows in `columns`."""
+    out = OrderedDict()
+    if len(result.components) < 2:
+        return out
+    kws = dict(result.userkws)
+    kws.update((name, columns[col]) for name, col in indep.items())
+    shape = columns['data'].shape
+    for comp in result.components:
+        # Components like ConstantModel may evaluate to a scalar
+        out[comp.name] = np.broadcast_to(
+            comp.eval(params=result.params, **kws), shape)
+    return out
+
+
+def _check_x_eval(max_points, stride):
+    """Raise an error if decimation is requested together with `x_eval`."""
+    if max_points is not None or stride is not None:
+        raise ValueError('`max_points` and `stride` are not supported with '
+                         '`x_eval`: pass a shorter `x_eval` instead.')
+
+
+@_augment_many.register(lmfit.model.ModelResult)
+def _augment_lmfit_many(result, results, x_eval=None, **kwargs):
+    """Evaluate many `ModelResult` on the same `x_eval` grid at once.
+
+    Results are grouped by model (see :func:`_model_key`) and each group is
+    evaluated with a single broadcasted call (see :func:`_eval_model`).
+    Without `x_eval`, return None to augment each result separately.
+    """
+    if x_eval is None:
+        return None
+    _check_x_eval(kwargs.get('max_points'), kwargs.get('stride'))
+    x_eval = np.asarray(x_eval)
+    groups = OrderedDict()
+    for i, res in enumerate(results):
+        groups.setdefault(_model_key(res.model), []).append(i)
+    shape = (len(results), x_eval.size)
+    evaluated = OrderedDict()
+    for index in groups.values():
+        params_list = [results[i].params for i in index]
+        values = _eval_model(results[index[0]].model, params_list, x_eval)
+        for name, arr in values.items():
+            if name not in evaluated:
+                evaluated[name] = np.full(shape, np.nan)
+            evaluated[name][index] = arr
+    columns = OrderedDict([('x', np.tile(x_eval, len(results)))])
+    for name, arr in evaluated.items():
+        columns[name] = arr.ravel()
+    return columns, np.full(len(results), x_eval.size)
+
+
+@augment.register(lmfit.minimizer.MinimizerResult)
+def augment_minimizer(result, output='dataframe', compact=False, x=None,
+                      data=None, max_points=None, stride=None,
+                      method='uniform'):
+    """Tidy residuals from lmfit's `MinimizerResult` (e.g. `lmfit.minimize`).
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`augment`. A `MinimizerResult` has no
+    model nor data, only the residual vector returned by the objective
+    function, so the data and independent variable can be optionally
+    passed as arguments.
+
+    Arguments:
+        result (`MinimizerResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        x, data (array or None): independent variable and data with the
+            same size of `result.residual`. When augmenting a collection of
+            results, they can also be 2D arrays with one row per result.
+        max_points, stride, method: decimate the returned rows, see
+            :func:`pybroom.utils.decimation_index`.
+
+    Returns:
+        A DataFrame with one row for each element of `result.residual`
+        with columns `x` and `data` (if passed) and `residual`.
+        With `output='dict'`, the columns are views of the input arrays.
+    """
+    residual = np.asarray(result.residual).ravel()
+    columns = _point_arrays(OrderedDict([('x', x), ('data', data)]),
+                            residual.size)
+    columns['residual'] = residual
+    y = columns.get('data', residual)
+    index = decimation_index(y, columns.get('x'), max_points, stride, method)
+    if index is not None:
+        for col in columns:
+            columns[col] = columns[col][index]
+    return _build_output(columns, output, compact)
+
+
+@_augment_many.register(lmfit.minimizer.MinimizerResult)
+def _augment_minimizer_many(result, results, x=None, data=None,
+                            max_points=None, stride=None, method='uniform'):
+    """Concatenate the residuals of many `MinimizerResult` at once.
+
+    `x` and `data` are either 1D arrays shared by all the results or 2D
+    arrays with one row per result. With decimation, each result is
+    augmented separately (with its row of `x` and `data`).
+    """
+    if max_points is not None or stride is not None:
+        rows = [_result_rows(name, values, len(results))
+                for name, values in (('x', x), ('data', data))]
+        columns_list = [
+            augment_minimizer(res, output='dict', x=x_i, data=data_i,
+                              max_points=max_points, stride=stride,
+                              method=method)
+            for res, x_i, data_i in zip(results, *rows)]
+        lengths = np.array([len(c['residual']) for c in columns_list],
+                           dtype=np.intp)
+        return _concat_columns(columns_list), lengths
+    residuals = [np.asarray(res.residual).ravel() for res in results]
+    lengths = np.array([r.size for r in residuals], dtype=np.intp)
+    columns = _stack_point_arrays(OrderedDict([('x', x), ('data', data)]),
+                                  lengths)
+    columns['residual'] = np.concatenate(residuals)
+    return columns, lengths
+
+
+def _result_rows(name, values, n_results):
+    """Split the per-point array `values` in one item per result.
+
+    1D arrays are shared by all the results, 2D arrays have one row per
+    result (as in :func:`pybroom.utils._stack_point_arrays`).
+    """
+    if values is None:
+        return [None] * n_results
+    values = np.asarray(values)
+    if values.ndim == 1:
+        return [values] * n_results
+    if values.shape[0] != n_results:
+        msg = '`%s` must be 1D or have one row per result.'
+        raise ValueError(msg % name)
+    return list(values)
+
+
+def _independent_var(model):
+    independent_vars = model.independent_vars
+    if len(independent_vars) != 1:
         msg = ('Only 1 independent variable is currently supported.\n'
                'Found independent variables: %s' % str(independent_vars))
         raise NotImplementedError(msg)
+    return independent_vars[0]
+
 
-    x_array = result.userkws[independent_var]
-    d.loc[:, 'x'] = x_array
+def _model_key(model):
+    """Key identifying models which evaluate to the same function.
 
-    if len(result.components) > 1:
-        comp_names = [c.name for c in result.components]
-        for cname, comp in zip(comp_names, result.components):
-            d.loc[:, cname] = comp.eval(x=d.x, **result.values)
-    return d.apply(pd.to_numeric, errors='ignore')
+    Models with the same `repr` can have different functions (e.g. two
+    functions with the same name), so the component functions (compared
+    by identity), their options and the parameter and independent
+    variables names are part of the key.
+    """
+    components = tuple((c.func, c.prefix, repr(sorted(c.opts.items())))
+                       for c in model.components)
+    return (repr(model), components, tuple(model.param_names),
+            tuple(model.independent_vars))
+
+
+def _broadcast_2d(values, shape):
+    """Check that `values` was broadcast to `shape` by the model function.
+    """
+    values = np.asarray(values)
+    if values.ndim != 2 or any(n not in (1, m)
+                               for n, m in zip(values.shape, shape)):
+        raise ValueError('The model function does not broadcast.')
+    return np.broadcast_to(values, shape)
+
+
+def _eval_model(model, params_list, x_eval):
+    """Evaluate `model` on `x_eval` for each `Parameters` in `params_list`.
+
+    The parameter values are stacked in column arrays and the model is
+    evaluated once, broadcasting over `(n_params_sets, len(x_eval))`.
+    Models whose function does not broadcast (the output shape is not
+    compatible or the last row differs from a separate evaluation) are
+    evaluated once for each item in `params_list`.
+
+    Returns:
+        An OrderedDict with 2D arrays for `best_fit` and for each model
+        component (if more than one).
+    """
+    independent_var = _independent_var(model)
+    components = model.components if len(model.components) > 1 else []
+    shape = (len(params_list), x_eval.size)
+    kws = {name: np.array([params[name].value for params in params_list])
+           [:, None] for name in model.param_names}
+    kws[independent_var] = x_eval[None, :]
+    out = OrderedDict()
+    try:
+        out['best_fit'] = _broadcast_2d(model.eval(**kws), shape)
+        for comp in components:
+            out[comp.name] = _broadcast_2d(comp.eval(**kws), shape)
+        # Functions reducing over the parameters arrays (e.g. `np.mean`)
+        # broadcast to the right shape with wrong values
+        last = model.eval(params_list[-1], **{independent_var: x_eval})
+        if not np.allclose(out['best_fit'][-1], last, equal_nan=True):
+            raise ValueError('The model function does not broadcast.')
+    except (ValueError, TypeError):
+        # Fall back to evaluating each set of parameters separately
+        kws = {independent_var: x_eval}
+        out['best_fit'] = np.array([
+            np.broadcast_to(model.eval(params, **kws), x_eval.shape)
+            for params in params_list])
+        for comp in components:
+            out[comp.name] = np.array([
+                np.broadcast_to(comp.eval(params, **kws), x_eval.shape)
+                for params in params_list])
+    return out
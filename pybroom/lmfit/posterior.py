@@ -0,0 +1,172 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+Tidying of the posterior samples of lmfit's `Minimizer.emcee` results.
+
+The chain of an emcee `MinimizerResult` can hold hundreds of millions of
+samples. The functions in this module read the chain in chunks, applying
+burn-in and thinning as strided views, so that the long-form data
+(one row per sample and parameter) is never built in memory as a whole.
+The long-form data can be written chunk by chunk to a memory-mapped
+``.npy`` file or to a Parquet file (requires `pyarrow`).
+"""
+from collections import OrderedDict
+import numpy as np
+from ..utils import _build_output
+
+
+def _chain(result, burn=0, thin=1):
+    """Return a `(steps, walkers, nvarys)` view of the chain of `result`.
+
+    Burn-in and thinning are applied to the steps without copying.
+    """
+    chain = getattr(result, 'chain', None)
+    if chain is None:
+        raise ValueError('The fit result has no `chain` attribute '
+                         '(is it the result of `Minimizer.emcee`?).')
+    chain = np.asarray(chain)
+    if chain.ndim == 2:
+        chain = chain[:, None, :]
+    return chain[burn::thin]
+
+
+def iter_posterior(result, burn=0, thin=1, chunksize=2**20):
+    """Yield the posterior samples of an emcee result in long form, in chunks.
+
+    Arguments:
+        result (`MinimizerResult`): result of `lmfit.Minimizer.emcee`.
+        burn (int): number of initial steps of the chain to discard.
+        thin (int): only use one step every `thin` steps.
+        chunksize (int): approximate number of samples in each chunk.
+            A chunk always contains whole steps (all the walkers).
+
+    Yields:
+        An OrderedDict of arrays for each chunk, with columns `sample`
+        (index of the sample in the flattened chain, after burn-in and
+        thinning), `name` (parameter name) and `value`.
+    """
+    chain = _chain(result, burn, thin)
+    n_steps, n_walkers, n_params = chain.shape
+    names = np.empty(n_params, dtype=object)
+    names[:] = list(result.var_names)
+    steps_per_chunk = max(1, chunksize // n_walkers)
+    for start in range(0, n_steps, steps_per_chunk):
+        block = chain[start:start + steps_per_chunk]
+        n_samples = block.shape[0] * n_walkers
+        first = start * n_walkers
+        columns = OrderedDict()
+        columns['sample'] = np.repeat(
+            np.arange(first, first + n_samples, dtype=np.int64), n_params)
+        columns['name'] = np.tile(names, n_samples)
+        columns['value'] = block.reshape(-1)
+        yield columns
+
+
+def tidy_posterior(result, burn=0, thin=1, quantiles=None, sink=None,
+                   chunksize=2**20, output='dataframe', compact=False):
+    """Tidy the posterior samples of lmfit's `Minimizer.emcee` results.
+
+    Normally this function is not called directly but invoked by
+    :func:`pybroom.tidy` with `what='posterior'`.
+
+    Arguments:
+        result (`MinimizerResult`): result of `lmfit.Minimizer.emcee`.
+        burn (int): number of initial steps of the chain to discard.
+        thin (int): only use one step every `thin` steps.
+        quantiles (list or None): if not None, return a summary with one
+            row per parameter instead of the samples, with columns `name`,
+            `mean`, `std` and a column `q<q>` for each quantile `q`
+            (e.g. `q0.5` for the median).
+        sink (string or None): path of a file where the long-form samples
+            are written chunk by chunk. If the path ends with ``.parquet``
+            a Parquet file is written (requires `pyarrow`), otherwise a
+            ``.npy`` file containing a structured array. Only valid for
+            a single fit result (not for a collection).
+        chunksize (int): approximate number of samples processed at once.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`. Ignored when `sink` is used.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Returns:
+        Without `sink`, the long-form samples (or the summary when
+        `quantiles` is used) in the type requested by `output`.
+        With a ``.npy`` `sink`, a read-only memory-mapped structured array
+        of the file. With a Parquet `sink`, the path of the file.
+    """
+    if quantiles is not None:
+        if sink is not None:
+            raise ValueError('`quantiles` and `sink` cannot be used together.')
+        columns = _posterior_summary(result, burn, thin, quantiles)
+        return _build_output(columns, output, compact)
+    chunks = iter_posterior(result, burn, thin, chunksize)
+    if sink is None:
+        columns_list = list(chunks)
+        if not columns_list:
+            columns_list = [OrderedDict((name, np.array([])) for name in
+                                        ('sample', 'name', 'value'))]
+        columns = OrderedDict(
+            (name, np.concatenate([c[name] for c in columns_list]))
+            for name in columns_list[0])
+        return _build_output(columns, output, compact)
+    if str(sink).endswith('.parquet'):
+        return _write_parquet(chunks, sink)
+    return _write_npy(chunks, sink, result, burn, thin)
+
+
+def _posterior_summary(result, burn, thin, quantiles):
+    """Mean, std and quantiles of each parameter, one column at a time."""
+    chain = _chain(result, burn, thin)
+    columns = OrderedDict()
+    columns['name'] = list(result.var_names)
+    stats = np.full((len(columns['name']), 2 + len(quantiles)), np.nan)
+    for i in range(chain.shape[-1]):
+        samples = chain[..., i].ravel()
+        if samples.size:
+            stats[i, 0] = samples.mean()
+            stats[i, 1] = samples.std()
+            stats[i, 2:] = np.quantile(samples, quantiles)
+    columns['mean'] = stats[:, 0]
+    columns['std'] = stats[:, 1]
+    for k, q in enumerate(quantiles):
+        columns['q{:g}'.format(q)] = stats[:, 2 + k]
+    return columns
+
+
+def _write_npy(chunks, path, result, burn, thin):
+    n_steps, n_walkers, n_params = _chain(result, burn, thin).shape
+    max_len = max([len(name) for name in result.var_names] + [1])
+    dtype = [('sample', np.int64), ('name', 'U%d' % max_len),
+             ('value', np.float64)]
+    out = np.lib.format.open_memmap(
+        path, mode='w+', dtype=dtype, shape=(n_steps * n_walkers * n_params,))
+    start = 0
+    for columns in chunks:
+        stop = start + len(columns['value'])
+        for name, values in columns.items():
+            out[name][start:stop] = values
+        start = stop
+    out.flush()
+    del out
+    return np.load(path, mmap_mode='r')
+
+
+def _write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Writing Parquet files requires `pyarrow`.')
+    writer = None
+    try:
+        for columns in chunks:
+            table = pa.table(OrderedDict(
+                (name, pa.array(values)) for name, values in columns.items()))
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
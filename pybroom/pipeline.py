@@ -0,0 +1,210 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+This module contains functions to fit a model to many datasets and tidy
+the fit results in a single pass:
+
+- :func:`fit_many`
+- :func:`iter_fit_many`
+
+The fits are performed in chunks, optionally in a pool of worker processes.
+Each worker fits the model and tidies the results in-process with
+:func:`pybroom.glance`, :func:`pybroom.tidy` or :func:`pybroom.augment`,
+sending back only the tidy columns. Fit result objects (which hold the
+data, the model and the minimizer) are never kept in memory nor pickled.
+
+Example:
+    Fit a `lmfit.Model` to a dict of datasets sharing the same `x`::
+
+        >>> datasets = {'A': y1, 'B': y2, 'C': y3}
+        >>> out = br.fit_many(model, datasets, params, fit_kws={'x': x},
+        ...                   n_jobs=4, var_names='dataset')
+        >>> out['glance']  # also out['tidy']
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .pybroom import glance, tidy, augment
+from .pybroom import _prepare_collection, _keyed_output
+from .utils import _as_what_list, _concat_columns, _n_workers
+
+_FUNCS = {'glance': glance, 'tidy': tidy, 'augment': augment}
+
+
+def _fit_chunk(model, datasets, params, fit_kws, what_list):
+    """Fit and tidy a chunk of datasets. Executed in the worker processes.
+
+    Returns:
+        A dict with an item for each name in `what_list`. Each item is a
+        tuple `(columns, lengths)` with the concatenated columns of all the
+        fits in the chunk and the number of rows of each fit.
+    """
+    columns = {name: [] for name in what_list}
+    for dataset in datasets:
+        kws = dict(fit_kws)
+        if isinstance(dataset, tuple):
+            dataset, dataset_kws = dataset
+            kws.update(dataset_kws)
+        result = model.fit(dataset, params, **kws)
+        for name in what_list:
+            columns[name].append(_FUNCS[name](result, output='dict'))
+        del result
+    out = {}
+    for name, columns_list in columns.items():
+        lengths = [len(next(iter(c.values()))) if c else 0
+                   for c in columns_list]
+        out[name] = (_concat_columns(columns_list), lengths)
+    return out
+
+
+def _fit_chunks(model, leaves, params, fit_kws, what_list, n_jobs,
+                chunksize):
+    """Yield `(start, stop, chunk_output)` for each chunk of `leaves`.
+
+    With worker processes, at most `2 * n_workers` chunks are submitted
+    at any time: a new chunk is submitted only when the output of the
+    oldest one has been consumed.
+    """
+    bounds = [(start, min(start + chunksize, len(leaves)))
+              for start in range(0, len(leaves), chunksize)]
+    n_workers = _n_workers(n_jobs)
+    if n_workers == 1:
+        for start, stop in bounds:
+            yield start, stop, _fit_chunk(model, leaves[start:stop], params,
+                                          fit_kws, what_list)
+        return
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for start, stop in bounds:
+            if len(pending) == 2 * n_workers:
+                start_done, stop_done, future = pending.popleft()
+                yield start_done, stop_done, future.result()
+            future = executor.submit(_fit_chunk, model, leaves[start:stop],
+                                     params, fit_kws, what_list)
+            pending.append((start, stop, future))
+        while pending:
+            start, stop, future = pending.popleft()
+            yield start, stop, future.result()
+
+
+def _prepare_datasets(datasets, var_names, output):
+    """Flatten the collection `datasets`, see :func:`_prepare_collection`.
+
+    The rows of a numeric array (2D or more) are the datasets.
+    """
+    if isinstance(datasets, np.ndarray) and datasets.dtype != object:
+        if datasets.ndim < 2:
+            raise ValueError('A numeric array of datasets must have one '
+                             'dataset per row (2 or more dimensions).')
+        datasets = list(datasets)
+    return _prepare_collection(datasets, var_names, False, output)
+
+
+def iter_fit_many(model, datasets, params=None, what=('glance', 'tidy'),
+                  var_names=None, n_jobs=1, chunksize=64, fit_kws=None,
+                  output='dataframe', compact=False):
+    """Fit `model` to each dataset and yield tidy output in chunks.
+
+    This is the streaming version of :func:`fit_many`: the output for
+    each chunk of datasets is yielded (in order) as soon as it is
+    available, so that it can be written to disk or to any other sink
+    without holding all the tidy data in memory.
+
+    Arguments:
+        See :func:`fit_many`.
+
+    Yields:
+        A dict with the output of each tidying function in `what` for the
+        current chunk of datasets. Key columns identify each dataset as
+        in the output of :func:`fit_many`.
+    """
+    what_list = _as_what_list(what)
+    leaves, levels, is_dict, var_names = _prepare_datasets(
+        datasets, var_names, output)
+    fit_kws = {} if fit_kws is None else fit_kws
+    chunks = _fit_chunks(model, leaves, params, fit_kws, what_list, n_jobs,
+                         chunksize)
+    for start, stop, chunk in chunks:
+        chunk_levels = [(codes[start:stop], categories)
+                        for codes, categories in levels]
+        out = {}
+        for name in what_list:
+            columns, lengths = chunk[name]
+            out[name] = _keyed_output(columns, chunk_levels,
+                                      np.asarray(lengths, dtype=np.intp),
+                                      is_dict, var_names, output=output,
+                                      compact=compact)
+        yield out
+
+
+def fit_many(model, datasets, params=None, what=('glance', 'tidy'),
+             var_names=None, n_jobs=1, chunksize=64, fit_kws=None,
+             output='dataframe', compact=False):
+    """Fit `model` to each dataset and return the tidy fit results.
+
+    Each dataset is fitted with ``model.fit(data, params, **fit_kws)``
+    (e.g. a `lmfit.Model`) and the fit result is immediately tidied with
+    the functions in `what`. When `n_jobs` > 1, chunks of datasets are
+    fitted and tidied in a pool of worker processes, which send back
+    only the tidy columns. The fit result objects are discarded as soon
+    as they have been tidied.
+
+    Arguments:
+        model: the model to fit. It must have a method
+            ``fit(data, params, **kwargs)`` returning a fit result
+            supported by pybroom. It must be picklable if `n_jobs` > 1.
+        datasets (list, dict, nested dict/list, pandas.Series or ndarray):
+            collection of datasets, with the same layout supported by
+            :func:`pybroom.glance`. Each dataset is either the data array
+            or a tuple `(data, kws)` where `kws` is a dict of additional
+            arguments for `model.fit` (e.g. the independent variables)
+            specific to the dataset. A numeric array (2D or more) is a
+            collection of datasets, one for each row.
+        params: parameters passed to ``model.fit`` for all the datasets.
+        what (string or sequence of strings): tidying functions to apply
+            to each fit result. Valid names are `'glance'`, `'tidy'` and
+            `'augment'`.
+        var_names (string or list): name(s) of the key column(s), see
+            :func:`pybroom.glance`.
+        n_jobs (int): number of worker processes. If 1 (default), fits
+            are performed in the current process. Negative values are
+            relative to the number of CPUs (-1 means all the CPUs).
+        chunksize (int): number of datasets fitted and tidied in each
+            task sent to the workers. At most `2 * n_jobs` tasks are
+            submitted at any time.
+        fit_kws (dict or None): additional arguments passed to
+            ``model.fit`` for all the datasets (e.g. `x`).
+        output (string): type of the returned objects, one of
+            `'dataframe'`, `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean DataFrames
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Returns:
+        The output of the tidying function when `what` is a string,
+        otherwise a dict of outputs with the names in `what` as keys.
+
+    See also:
+        :func:`iter_fit_many` to get the output in chunks.
+    """
+    what_list = _as_what_list(what)
+    leaves, levels, is_dict, var_names = _prepare_datasets(
+        datasets, var_names, output)
+    fit_kws = {} if fit_kws is None else fit_kws
+    chunks = _fit_chunks(model, leaves, params, fit_kws, what_list, n_jobs,
+                         chunksize)
+    columns = {name: [] for name in what_list}
+    lengths = {name: [] for name in what_list}
+    for _, _, chunk in chunks:
+        for name in what_list:
+            columns[name].append(chunk[name][0])
+            lengths[name].extend(chunk[name][1])
+    out = {}
+    for name in what_list:
+        out[name] = _keyed_output(_concat_columns(columns[name]), levels,
+                                  np.asarray(lengths[name], dtype=np.intp),
+                                  is_dict, var_names, output=output,
+                                  compact=compact)
+    if isinstance(what, str):
+        return out[what]
+    return out
@@ -41,6 +41,14 @@ Note:
     The tuple (key, list index) identifies each single fit result.
     In this case `var_names` should be a list of column names for
     the keys and index column respectively (list of strings)
+    A `pandas.Series` of fit results (e.g. the output of
+    ``df.groupby(keys).apply(fit_function)``) is also accepted: the index
+    levels become the key columns, named after the index names unless
+    `var_names` is passed. Similarly, for an N-D object `numpy.ndarray`
+    of fit results the key columns contain the indices along each axis.
+    Dict keys are stored as ordered `pandas.Categorical` columns built
+    directly from integer codes. Passing `as_index=True` returns the keys
+    as a `pandas.MultiIndex` (one level per name in `var_names`) instead.
 
 
 Example:
@@ -82,8 +90,11 @@ Example:
 
 """
 from collections import OrderedDict
+from concurrent.futures import Future, as_completed
 from functools import singledispatch
+import numpy as np
 import pandas as pd
+from .utils import _build_output, _check_output, _concat_columns
 
 
 @singledispatch
@@ -101,10 +112,34 @@ def tidy(result, var_names='key', **kwargs):
     Arguments:
         result (fit result object or list): one of the supported fit result
             objects or a list of supported fit result objects. When a list,
-            all the elements need to be of the same type.
+            all the elements need to be of the same type. Elements can
+            also be `concurrent.futures.Future` returning a fit result:
+            each result is tidied as soon as its future completes, or
+            with the other results when a batch implementation exists.
+            The output is the same as for the resolved results.
         var_names (string or list): name(s) of the column(s) containing
             an "index" that is different for each element in the set of
             fit results.
+        as_index (bool): if True and `result` is a collection, return
+            the keys as a `pandas.MultiIndex` instead of "key" columns.
+        output (string): type of the returned object. Valid values are
+            `'dataframe'` (default), `'numpy'` (a NumPy structured array),
+            `'records'` (a list of dicts) and `'dict'` (a dict of arrays).
+            Non-DataFrame outputs are built directly from the data extracted
+            from each result, bypassing pandas.
+        compact (bool or string): if True, return a memory-lean DataFrame
+            with categorical string columns and nullable booleans.
+            If `'float32'`, float columns are also downcast to float32.
+        layout (string): `'long'` (default) returns one row per parameter.
+            `'wide'` (only for collections of fit results) returns one row
+            per fit result with a column for each parameter value and a
+            column `<name>_stderr` for each standard error.
+        what (string): `'parameters'` (default) returns one row per
+            parameter. `'covariance'` returns the parameters covariance in
+            long form, one row per pair of parameters in the upper triangle
+            of the covariance matrix (diagonal included), with columns
+            `param_i`, `param_j`, `cov` and `corr`. See also
+            :func:`covariance_array`.
         param_names (string or list of string): names of the fitted parameters
             for fit results which don't include parameter's names
             (such as scipy's OptimizeResult). It can either be a list of
@@ -144,10 +179,24 @@ def glance(results, var_names='key', **kwargs):
     Arguments:
         result (fit result object or list): one of the supported fit result
             objects or a list of supported fit result objects. When a list,
-            all the elements need to be of the same type.
+            all the elements need to be of the same type. Elements can
+            also be `concurrent.futures.Future` returning a fit result:
+            each result is tidied as soon as its future completes, or
+            with the other results when a batch implementation exists.
+            The output is the same as for the resolved results.
         var_names (string or list): name(s) of the column(s) containing
             an "index" that is different for each element in the set of
             fit results.
+        as_index (bool): if True and `result` is a collection, return
+            the keys as a `pandas.MultiIndex` instead of "key" columns.
+        output (string): type of the returned object. Valid values are
+            `'dataframe'` (default), `'numpy'` (a NumPy structured array),
+            `'records'` (a list of dicts) and `'dict'` (a dict of arrays).
+            Non-DataFrame outputs are built directly from the data extracted
+            from each result, bypassing pandas.
+        compact (bool or string): if True, return a memory-lean DataFrame
+            with categorical string columns and nullable booleans.
+            If `'float32'`, float columns are also downcast to float32.
         **kwargs: additional arguments passed to the underlying specialized
             tidying function.
 
@@ -187,6 +236,16 @@ def augment(results, var_names='key', **kwargs):
         var_names (string or list): name(s) of the column(s) containing
             an "index" that is different for each element in the set of
             fit results. See the example section below.
+        as_index (bool): if True and `results` is a collection, return
+            the keys as a `pandas.MultiIndex` instead of "key" columns.
+        output (string): type of the returned object. Valid values are
+            `'dataframe'` (default), `'numpy'` (a NumPy structured array),
+            `'records'` (a list of dicts) and `'dict'` (a dict of arrays).
+            Non-DataFrame outputs are built directly from the data extracted
+            from each result, bypassing pandas.
+        compact (bool or string): if True, return a memory-lean DataFrame
+            with categorical string columns and nullable booleans.
+            If `'float32'`, float columns are also downcast to float32.
         **kwargs: additional arguments passed to the underlying specialized
             tidying function.
 
@@ -203,6 +262,90 @@ def augment(results, var_names='key', **kwargs):
     raise NotImplementedError(msg % type(results))
 
 
+@singledispatch
+def _covariance(result, **kwargs):
+    """Return the parameters covariance matrix of a fit result.
+
+    Specialized modules register an implementation for each supported fit
+    result type, returning a tuple `(param_names, cov)` where `cov` is a
+    2D array with rows and columns in the same order as `param_names`.
+    """
+    msg = 'Sorry, covariance is not supported for this object type (%s)'
+    raise NotImplementedError(msg % type(result))
+
+
+def covariance_array(results, **kwargs):
+    """Stack the covariance matrices of one or more fit results.
+
+    Arguments:
+        results (fit result object or collection): one of the supported
+            fit result objects, or a collection (list, dict, nested
+            dict/list, pandas.Series or object ndarray) of fit results.
+        **kwargs: additional arguments passed to the specialized function
+            (e.g. `param_names` for scipy's `OptimizeResult`).
+
+    Returns:
+        A tuple `(cov, param_names)` where `cov` is an array of shape
+        `(n_results, p, p)` and `param_names` is the list of the `p`
+        parameters names, in the same order as the rows and columns of each
+        matrix. When the results have different parameters, `param_names`
+        is the union of all the names and missing elements are NaN.
+        Results in a collection are in the same order as the rows of
+        :func:`tidy` output.
+    """
+    if _is_multi(results):
+        leaves = _prepare_collection(results, None, False, 'dataframe')[0]
+    else:
+        leaves = [results]
+    covs = [_covariance(res, **kwargs) for res in leaves]
+    index = OrderedDict()
+    for names, _ in covs:
+        index.update((name, None) for name in names)
+    index = {name: i for i, name in enumerate(index)}
+    out = np.full((len(covs), len(index), len(index)), np.nan)
+    for k, (names, cov) in enumerate(covs):
+        pos = np.array([index[name] for name in names], dtype=np.intp)
+        out[k, pos[:, None], pos[None, :]] = cov
+    return out, list(index)
+
+
+@singledispatch
+def _tidy_many(result, results, **kwargs):
+    """Batch version of :func:`tidy` for a list of results of the same type.
+
+    Specialized modules can register an implementation for a fit result
+    type to process all the results at once (e.g. with stacked arrays)
+    instead of one by one. `result` is the first element of `results` and
+    is only used for the dispatch. Implementations return a tuple
+    `(columns, lengths)` with the concatenated columns (an OrderedDict of
+    1-D arrays) and the number of rows for each result, or None to fall
+    back to calling `tidy` on each result.
+    """
+    return None
+
+
+@singledispatch
+def _glance_many(result, results, **kwargs):
+    """Batch version of :func:`glance`, see :func:`_tidy_many`."""
+    return None
+
+
+@singledispatch
+def _augment_many(result, results, **kwargs):
+    """Batch version of :func:`augment`, see :func:`_tidy_many`."""
+    return None
+
+
+_MANY = {tidy: _tidy_many, glance: _glance_many, augment: _augment_many}
+
+
+def _has_batch(func, result):
+    """True if a batch implementation of `func` is registered for `result`.
+    """
+    many = _MANY[func]
+    return many.dispatch(type(result)) is not many.dispatch(object)
+
+
 def _as_odict_copy(results):
     """Transform input into a OrderedDict, if needed. Returns a copy.
     """
@@ -222,30 +365,219 @@ def _as_list_of_strings_copy(var_names):
 
 @tidy.register(list)
 @tidy.register(dict)
-def _tidy_multi_dataframe(results, var_names='key', **kwargs):
+@tidy.register(pd.Series)
+@tidy.register(np.ndarray)
+def _tidy_multi_dataframe(results, var_names=None, layout='long', **kwargs):
+    _check_tidy_kwargs(layout, kwargs)
+    if layout == 'wide':
+        return _tidy_wide(results, var_names, **kwargs)
     return _multi_dataframe(tidy, results, var_names, **kwargs)
 
 
+def _check_tidy_kwargs(layout, kwargs):
+    """Validate the arguments of :func:`tidy` for a collection of results.
+    """
+    if layout not in ('long', 'wide'):
+        msg = "`layout` must be 'long' or 'wide', not %r."
+        raise ValueError(msg % (layout,))
+    if kwargs.get('sink') is not None:
+        raise ValueError('`sink` writes the output of a single fit result '
+                         'to a file: it is not supported for a collection '
+                         'of fit results.')
+
+
 @glance.register(list)
 @glance.register(dict)
-def _glance_multi_dataframe(results, var_names='key', **kwargs):
+@glance.register(pd.Series)
+@glance.register(np.ndarray)
+def _glance_multi_dataframe(results, var_names=None, **kwargs):
     return _multi_dataframe(glance, results, var_names, **kwargs)
 
 
 @augment.register(list)
 @augment.register(dict)
-def _augment_multi_dataframe(results, var_names='key', **kwargs):
+@augment.register(pd.Series)
+@augment.register(np.ndarray)
+def _augment_multi_dataframe(results, var_names=None, **kwargs):
     return _multi_dataframe(augment, results, var_names, **kwargs)
 
 
-def _multi_dataframe(func, results, var_names, **kwargs):
-    """Recursively call `func` on each item in `results` and concatenate output.
+@tidy.register(Future)
+def _tidy_future(future, **kwargs):
+    return tidy(future.result(), **kwargs)
+
+
+@glance.register(Future)
+def _glance_future(future, **kwargs):
+    return glance(future.result(), **kwargs)
+
+
+@augment.register(Future)
+def _augment_future(future, **kwargs):
+    return augment(future.result(), **kwargs)
+
+
+def _is_collection(res):
+    """Return True if `res` is a (nested) collection of fit results."""
+    # Some result classes subclass dict, so isinstance fails
+    return type(res) in {list, dict}
+
+
+def _is_multi(results):
+    """True if `results` is one of the supported collections of results."""
+    multi = (pd.Series, np.ndarray)
+    return _is_collection(results) or isinstance(results, multi)
+
+
+def _flatten_results(results, var_names):
+    """Flatten a nested collection of fit results.
+
+    Arguments:
+        results (dict or list): collection of fit results. It can be a list,
+            a dict or a nested structure such as a dict of lists.
+        var_names (list of strings): names of the key columns, one for each
+            nesting level.
+
+    Returns:
+        A tuple `(leaves, paths, is_dict)` where `leaves` is the list of
+        fit results, `paths` the list of key tuples identifying each leaf
+        and `is_dict` a list of bools, one for each nesting level,
+        True when at least one container at that level is a dict.
+    """
+    leaves, paths, is_dict = [], [], []
+
+    def walk(results, path):
+        level = len(path)
+        if level >= len(var_names):
+            msg = ('The list `var_names` is too short. Its length should be '
+                   'equal to the nesting levels in `results`.')
+            raise ValueError(msg)
+        if level == len(is_dict):
+            is_dict.append(False)
+        is_dict[level] |= isinstance(results, dict)
+        for key, res in _as_odict_copy(results).items():
+            if _is_collection(res):
+                walk(res, path + (key,))
+            else:
+                leaves.append(res)
+                paths.append(path + (key,))
+
+    walk(results, ())
+    return leaves, paths, is_dict
+
+
+def _key_codes(paths, is_dict):
+    """Compute integer codes and categories for each nesting level.
+
+    Arguments:
+        paths (list of tuples): keys identifying each fit result, as
+            returned by :func:`_flatten_results`.
+        is_dict (list of bools): whether each level holds dict keys.
+
+    Returns:
+        A list with one `(codes, categories)` tuple per level. `codes` is
+        an int array with one element per fit result (-1 when the result
+        is not nested down to that level) and `categories` is a
+        `pandas.Index` of the keys. For dict levels the categories are sorted
+        (if the keys are sortable), for list levels they are the list indices.
+    """
+    levels = []
+    for level, level_is_dict in enumerate(is_dict):
+        keys = [p[level] if len(p) > level else None for p in paths]
+        if level_is_dict:
+            uniq = OrderedDict.fromkeys(k for k, p in zip(keys, paths)
+                                        if len(p) > level)
+            categories = pd.Index(list(uniq), tupleize_cols=False)
+            try:
+                categories = categories.sort_values()
+            except TypeError:
+                pass
+            mapping = {k: i for i, k in enumerate(categories)}
+            codes = np.array([mapping[k] if len(p) > level else -1
+                              for k, p in zip(keys, paths)], dtype=np.intp)
+        else:
+            codes = np.array([k if len(p) > level else -1
+                              for k, p in zip(keys, paths)], dtype=np.intp)
+            categories = pd.RangeIndex(codes.max() + 1 if codes.size else 0)
+        levels.append((codes, categories))
+    return levels
+
+
+def _key_columns(levels, lengths, is_dict, compact=False):
+    """Build the key columns repeating each key `lengths` times.
+
+    Dict levels become ordered `pandas.Categorical` built directly from
+    the codes, list levels become int64 arrays (float if some results are
+    not nested down to that level). When `compact` is True, list levels
+    use the smallest unsigned integer type holding all the indices.
+    """
+    columns = []
+    for (codes, categories), level_is_dict in zip(levels, is_dict):
+        row_codes = np.repeat(codes, lengths)
+        if level_is_dict:
+            col = pd.Categorical.from_codes(row_codes, categories,
+                                            ordered=True)
+            columns.append(col)
+            continue
+        values = np.asarray(categories, dtype=np.int64)
+        if (codes < 0).any():
+            col = np.where(row_codes < 0, np.nan, values[row_codes])
+        elif compact and len(values) > 0:
+            dtype = np.promote_types(np.min_scalar_type(values.min()),
+                                     np.min_scalar_type(values.max()))
+            col = values[row_codes].astype(dtype)
+        else:
+            col = values[row_codes]
+        columns.append(col)
+    return columns
+
+
+def _key_values(levels, lengths, is_dict):
+    """Build the key columns as plain NumPy arrays (no pandas types).
+
+    Used for the non-DataFrame outputs. Results not nested down to a level
+    get a missing value (None, '' or NaN depending on the keys type).
+    """
+    columns = []
+    for (codes, categories), level_is_dict in zip(levels, is_dict):
+        if not level_is_dict:
+            values = np.append(np.asarray(categories, dtype=np.int64),
+                               np.iinfo(np.int64).min)
+            if (codes < 0).any():
+                values = np.where(values == values[-1], np.nan, values)
+        elif categories.inferred_type == 'string':
+            values = np.append(categories.values.astype(str), '')
+        else:
+            values = np.empty(len(categories) + 1, dtype=object)
+            values[:-1] = list(categories)
+        # Code -1 (missing) selects the last element appended above
+        columns.append(values[np.repeat(codes, lengths)])
+    return columns
+
+
+def _key_index(levels, lengths, var_names):
+    """Build a `pandas.MultiIndex` with one level per key column."""
+    return pd.MultiIndex(levels=[cat for _, cat in levels],
+                         codes=[np.repeat(codes, lengths)
+                                for codes, _ in levels],
+                         names=var_names, verify_integrity=False)
+
+
+def _multi_dataframe(func, results, var_names, as_index=False,
+                     output='dataframe', compact=False, **kwargs):
+    """Call `func` on each fit result in `results` and concatenate output.
 
     Usually `func` is :func:`glance`, :func:`tidy` or :func:`augment`.
-    The function `func` is also the calling function, therefore this implements
-    a recursion which unpacks the nested `results` structure (a tree) and
-    builds a global tidy DataFrame with "key" columns corresponding to
-    the `results` structure.
+    The nested `results` structure (a tree) is first flattened, then `func`
+    is called on each leaf and the outputs are concatenated in a global
+    tidy DataFrame with "key" columns corresponding to the `results`
+    structure. The key columns are built directly from integer codes,
+    without intermediate object arrays. When all the leaves have the same
+    type and a batch implementation is registered for it (see
+    :func:`_tidy_many`), all the leaves are processed in a single call.
+    Leaves which are `concurrent.futures.Future` are resolved as they
+    complete and the output is the same as for the resolved results (see
+    :func:`_futures_output`).
 
     Arguments:
         func (function): function of the called on each element of `results`.
@@ -256,30 +588,312 @@ def _multi_dataframe(func, results, var_names, **kwargs):
             the results. It can be a list of strings or single string in case
             only one categorical "index" is needed (i.e. a string is equivalent
             to a 1-element list of strings).
+        as_index (bool): if True, return the keys as a `pandas.MultiIndex`
+            (one level for each name in `var_names`) instead of columns.
+        output (string): output type, one of `'dataframe'` (default),
+            `'numpy'`, `'records'` or `'dict'`. With the non-DataFrame
+            outputs, the columns extracted from each result are
+            concatenated directly, without building intermediate DataFrames.
+        compact (bool or string): if True, string columns are categorical,
+            `vary`/`success` are nullable booleans and list indices use the
+            smallest integer type. If `'float32'`, float columns are also
+            downcast to float32. See :func:`pybroom.utils.compact_columns`.
 
     Returns:
         "Tidy" DataFrame merging data from all the items in `results`.
         Necessary "key" columns are added to encode layout of fitting result
-        objects in `results`.
+        objects in `results`. The type of the returned object depends
+        on `output`.
     """
-    if len(var_names) == 0:
-        msg = ('The list `var_names` is too short. Its length should be equal '
-               'to the nesting levels in `results`.')
-        raise ValueError(msg)
-    d = _as_odict_copy(results)
-    var_names = _as_list_of_strings_copy(var_names)
-    var_name = var_names.pop(0)
-    for i, (key, res) in enumerate(d.items()):
-        # Some result classes subclass dict, so isinstance fails
-        if type(res) in {list, dict}:
-            d[key] = func(res, var_names, **kwargs)
+    leaves, levels, is_dict, var_names = _prepare_collection(
+        results, var_names, as_index, output)
+    if any(isinstance(res, Future) for res in leaves):
+        return _futures_output(func, leaves, levels, is_dict, var_names,
+                               as_index, output, compact, **kwargs)
+    return _leaves_output(func, leaves, levels, is_dict, var_names, as_index,
+                          output, compact, **kwargs)
+
+
+def _leaves_output(func, leaves, levels, is_dict, var_names, as_index=False,
+                   output='dataframe', compact=False, **kwargs):
+    """Output of `func` for the fit results `leaves` of a collection.
+
+    `leaves`, `levels`, `is_dict` and `var_names` are returned by
+    :func:`_prepare_collection`. The batch implementations (see
+    :func:`_tidy_many`) are used when available and, for :func:`tidy`,
+    the `layout` argument is supported. See :func:`_multi_dataframe` for
+    the other arguments.
+    """
+    if func is tidy:
+        layout = kwargs.pop('layout', 'long')
+        _check_tidy_kwargs(layout, kwargs)
+        if layout == 'wide':
+            return _wide_output(leaves, levels, is_dict, var_names,
+                                as_index=as_index, output=output,
+                                compact=compact, **kwargs)
+    batch = None
+    if leaves and all(type(res) is type(leaves[0]) for res in leaves):
+        batch = _MANY[func](leaves[0], leaves, **kwargs)
+    if batch is not None:
+        columns, lengths = batch
+        return _keyed_output(columns, levels,
+                             np.asarray(lengths, dtype=np.intp), is_dict,
+                             var_names, as_index, output, compact)
+    parts = [_leaf_output(func, res, output, compact, kwargs)
+             for res in leaves]
+    return _concat_leaves(parts, levels, is_dict, var_names, as_index,
+                          output, compact)
+
+
+def _leaf_output(func, result, output, compact, kwargs):
+    """Output of `func` for one leaf, to be joined by :func:`_concat_leaves`.
+    """
+    if output != 'dataframe' or compact:
+        return func(result, output='dict', **kwargs)
+    return func(result, **kwargs)
+
+
+def _concat_leaves(parts, levels, is_dict, var_names, as_index=False,
+                   output='dataframe', compact=False):
+    """Join the outputs of :func:`_leaf_output` adding the key columns."""
+    if output != 'dataframe' or compact:
+        lengths = np.array([len(next(iter(c.values()))) if c else 0
+                            for c in parts], dtype=np.intp)
+        return _keyed_output(_concat_columns(parts), levels, lengths,
+                             is_dict, var_names, as_index, output, compact)
+    lengths = np.array([len(df) for df in parts], dtype=np.intp)
+    df = pd.concat(parts, ignore_index=True)
+    return _add_key_columns(df, levels, lengths, is_dict, var_names,
+                            as_index)
+
+
+def _futures_output(func, leaves, levels, is_dict, var_names, as_index=False,
+                    output='dataframe', compact=False, **kwargs):
+    """Output of `func` for `leaves` containing `concurrent.futures.Future`.
+
+    Futures are resolved in completion order. Results without a batch
+    implementation (see :func:`_tidy_many`) are tidied as soon as they
+    are available, while the other futures are still running. When all
+    the results have the same type with a batch implementation, they are
+    tidied together at the end. In both cases, the output is the same as
+    :func:`_leaves_output` on the resolved results.
+    """
+    resolved = list(leaves)
+    parts = [None] * len(leaves)
+    futures = {}
+
+    def done(i, result):
+        resolved[i] = result
+        if not _has_batch(func, result):
+            parts[i] = _leaf_output(func, result, output, compact, kwargs)
+
+    for i, res in enumerate(leaves):
+        if isinstance(res, Future):
+            futures.setdefault(res, []).append(i)
         else:
-            d[key] = func(res, **kwargs)
-        d[key][var_name] = key
-    df = pd.concat(d, ignore_index=True)
-    # Convert "key" column to categorical only if input was dict-type
-    # not list/tuple.
-    if isinstance(results, dict):
-        kw = {var_name: lambda x: pd.Categorical(x[var_name], ordered=True)}
-        df = df.assign(**kw)
+            done(i, res)
+    for future in as_completed(futures):
+        result = future.result()
+        for i in futures[future]:
+            done(i, result)
+    if all(type(res) is type(resolved[0]) for res in resolved):
+        if _has_batch(func, resolved[0]):
+            return _leaves_output(func, resolved, levels, is_dict, var_names,
+                                  as_index, output, compact, **kwargs)
+    parts = [_leaf_output(func, res, output, compact, kwargs)
+             if part is None else part
+             for res, part in zip(resolved, parts)]
+    return _concat_leaves(parts, levels, is_dict, var_names, as_index,
+                          output, compact)
+
+
+def _default_var_names(nlevels):
+    if nlevels == 1:
+        return ['key']
+    return ['key_%d' % i for i in range(nlevels)]
+
+
+def _index_levels(index):
+    """Return key levels from the levels of a `pandas.Index`.
+
+    The codes of each index level are used directly (no per-element key
+    assignment). Integer levels are treated as list indices, other levels
+    as dict keys.
+
+    Returns:
+        The tuple `(levels, is_dict, names)` where `levels` is as returned
+        by :func:`_key_codes` and `names` are the index names (unnamed
+        levels get a default name).
+    """
+    if isinstance(index, pd.MultiIndex):
+        levels = [(np.asarray(codes, dtype=np.intp), level)
+                  for codes, level in zip(index.codes, index.levels)]
+    else:
+        codes, categories = pd.factorize(index, sort=True)
+        levels = [(np.asarray(codes, dtype=np.intp), pd.Index(categories))]
+    is_dict = [not pd.api.types.is_integer_dtype(categories)
+               for _, categories in levels]
+    names = list(index.names)
+    defaults = _default_var_names(len(names))
+    names = [d if n is None else n for n, d in zip(names, defaults)]
+    return levels, is_dict, names
+
+
+def _flatten_series(results):
+    """Flatten a `pandas.Series` of fit results, keyed by its index.
+
+    Returns:
+        The tuple `(leaves, levels, is_dict, names)`, see
+        :func:`_index_levels`.
+    """
+    levels, is_dict, names = _index_levels(results.index)
+    return list(results.values), levels, is_dict, names
+
+
+def _flatten_ndarray(results):
+    """Flatten an N-D object array of fit results (one key level per axis).
+    """
+    codes = np.unravel_index(np.arange(results.size), results.shape)
+    levels = [(np.asarray(c, dtype=np.intp), pd.RangeIndex(n))
+              for c, n in zip(codes, results.shape)]
+    is_dict = [False] * results.ndim
+    return results.ravel().tolist(), levels, is_dict
+
+
+def _prepare_collection(results, var_names, as_index, output):
+    """Validate the arguments and flatten the collection `results`.
+
+    Returns:
+        The tuple `(leaves, levels, is_dict, var_names)`, see
+        :func:`_flatten_results` and :func:`_key_codes`. `var_names` is
+        a list truncated to the number of nesting levels.
+    """
+    _check_output(output)
+    if as_index and output != 'dataframe':
+        raise ValueError("`as_index` requires `output='dataframe'`.")
+    if isinstance(results, pd.Series):
+        leaves, levels, is_dict, names = _flatten_series(results)
+    elif isinstance(results, np.ndarray):
+        leaves, levels, is_dict = _flatten_ndarray(results)
+        names = _default_var_names(len(levels))
+    else:
+        names = ['key']
+    if var_names is None:
+        var_names = names
+    var_names = _as_list_of_strings_copy(var_names)
+    if isinstance(results, (pd.Series, np.ndarray)):
+        if len(var_names) < len(levels):
+            msg = ('The list `var_names` is too short. Its length should be '
+                   'equal to the number of index levels in `results`.')
+            raise ValueError(msg)
+    else:
+        if len(var_names) == 0:
+            msg = ('The list `var_names` is too short. Its length should be '
+                   'equal to the nesting levels in `results`.')
+            raise ValueError(msg)
+        leaves, paths, is_dict = _flatten_results(results, var_names)
+        levels = _key_codes(paths, is_dict)
+    return leaves, levels, is_dict, var_names[:len(is_dict)]
+
+
+def _add_key_columns(df, levels, lengths, is_dict, var_names,
+                     as_index=False, compact=False):
+    """Add the key columns (or a MultiIndex) to the DataFrame `df`."""
+    if as_index:
+        df.index = _key_index(levels, lengths, var_names)
+        return df
+    # Key columns are appended innermost first
+    columns = _key_columns(levels, lengths, is_dict, compact)
+    for var_name, col in reversed(list(zip(var_names, columns))):
+        df[var_name] = col
     return df
+
+
+def _keyed_output(columns, levels, lengths, is_dict, var_names,
+                  as_index=False, output='dataframe', compact=False):
+    """Build the output from a dict of columns, adding the key columns."""
+    if output != 'dataframe':
+        keys = _key_values(levels, lengths, is_dict)
+        for var_name, col in reversed(list(zip(var_names, keys))):
+            columns[var_name] = col
+        return _build_output(columns, output, compact)
+    df = _build_output(columns, output, compact)
+    return _add_key_columns(df, levels, lengths, is_dict, var_names,
+                            as_index, compact)
+
+
+def _tidy_wide(results, var_names, fields=('value', 'stderr'),
+               as_index=False, output='dataframe', compact=False, **kwargs):
+    """Tidy a collection of fit results with one row per fit result.
+
+    Each parameter `p` is stored in the columns `p` (the best-fit value)
+    and `p_<field>` for each additional field (e.g. `p_stderr`).
+    The values are copied from the parameter arrays returned by each
+    specialized tidying function into a preallocated 2D float array.
+    When all the fit results have the same parameters (in the same order)
+    rows are filled directly, otherwise the columns are the union of all
+    the parameters and missing values are NaN.
+
+    Arguments:
+        fields (sequence of strings): numeric columns of the long-form
+            `tidy` output to include for each parameter. Fields not returned
+            by the specialized tidying function are skipped.
+
+    See :func:`_multi_dataframe` for the other arguments.
+    """
+    leaves, levels, is_dict, var_names = _prepare_collection(
+        results, var_names, as_index, output)
+    return _wide_output(leaves, levels, is_dict, var_names, fields, as_index,
+                        output, compact, **kwargs)
+
+
+def _wide_output(leaves, levels, is_dict, var_names,
+                 fields=('value', 'stderr'), as_index=False,
+                 output='dataframe', compact=False, **kwargs):
+    """Wide output of :func:`tidy` for the fit results `leaves`.
+
+    See :func:`_tidy_wide` and :func:`_leaves_output`.
+    """
+    columns_list = [tidy(res, output='dict', **kwargs) for res in leaves]
+    return _wide_columns_output(columns_list, levels, is_dict, var_names,
+                                fields, as_index, output, compact)
+
+
+def _wide_columns_output(columns_list, levels, is_dict, var_names,
+                         fields=('value', 'stderr'), as_index=False,
+                         output='dataframe', compact=False):
+    """Wide output of :func:`tidy` from the long-form columns of each result.
+
+    `columns_list` contains the output of ``tidy(res, output='dict')``
+    for each fit result. See :func:`_tidy_wide` for the other arguments.
+    """
+    fields = [f for f in fields if any(f in c for c in columns_list)]
+    names = [np.asarray(c['name']) for c in columns_list]
+    same_params = all(np.array_equal(n, names[0]) for n in names)
+    if same_params:
+        param_names = list(names[0])
+        wide = np.empty((len(columns_list), len(fields),
+                         len(param_names)))
+        for i, columns in enumerate(columns_list):
+            for j, field in enumerate(fields):
+                wide[i, j] = columns.get(field, np.nan)
+    else:
+        param_index = OrderedDict()
+        for n in names:
+            param_index.update((name, None) for name in n)
+        param_index = {name: k for k, name in enumerate(param_index)}
+        param_names = list(param_index)
+        wide = np.full((len(columns_list), len(fields), len(param_names)),
+                       np.nan)
+        for i, (columns, n) in enumerate(zip(columns_list, names)):
+            pos = [param_index[name] for name in n]
+            for j, field in enumerate(fields):
+                wide[i, j, pos] = columns.get(field, np.nan)
+    columns = OrderedDict()
+    for k, name in enumerate(param_names):
+        for j, field in enumerate(fields):
+            col_name = name if field == 'value' else '_'.join((name, field))
+            columns[col_name] = wide[:, j, k]
+    lengths = np.ones(len(columns_list), dtype=np.intp)
+    return _keyed_output(columns, levels, lengths, is_dict, var_names,
+                         as_index, output, compact)
@@ -0,0 +1,133 @@
+#
+# Copyright (c) 2016 Antonino Ingargiola and contributors.
+#
+"""
+This module contains :class:`FitRecord`, a lightweight summary of a fit
+result holding only the data returned by :func:`pybroom.tidy` and
+:func:`pybroom.glance` (and optionally :func:`pybroom.augment`).
+
+Fit result objects like `lmfit.model.ModelResult` hold references to the
+data, the model and the minimizer, which can easily take hundreds of KB
+per fit. Converting each result to a `FitRecord` as soon as the fit
+finishes allows dropping the original object. pybroom functions accept
+`FitRecord` objects (or collections of them) like any other fit result.
+
+Example:
+    Keep only the summaries of many fits::
+
+        >>> records = [br.FitRecord(model.fit(y, x=x)) for y in datasets]
+        >>> br.tidy(records)
+"""
+from collections import OrderedDict
+from .pybroom import glance, tidy, augment
+from .utils import _build_output
+
+
+class FitRecord:
+    """Compact summary of a fit result for `tidy`, `glance` and `augment`.
+
+    The data is extracted from the fit result by the specialized tidying
+    functions and stored in NumPy structured arrays, one for each function.
+    A `FitRecord` does not keep any reference to the fit result, it is
+    cheap to pickle (e.g. to send it to another process) and it is
+    accepted by :func:`pybroom.tidy`, :func:`pybroom.glance` and
+    :func:`pybroom.augment`.
+
+    Only the output computed when the record is created is stored: to
+    get a different `tidy` output (e.g. ``what='covariance'``) pass the
+    arguments to `FitRecord`. Calling `tidy`, `glance` or `augment` on a
+    record with additional arguments raises a `ValueError`.
+
+    Arguments:
+        result: a fit result supported by pybroom.
+        with_augment (bool): if True, also store the output of `augment`
+            (one row per data point). Default False.
+        **kwargs: additional arguments passed to `tidy`
+            (e.g. `param_names` for scipy's `OptimizeResult`, or `what`).
+    """
+    __slots__ = ('tidy_array', 'glance_array', 'augment_array')
+
+    def __init__(self, result, with_augment=False, **kwargs):
+        self.tidy_array = _extract(tidy, result, **kwargs)
+        self.glance_array = _extract(glance, result)
+        self.augment_array = None
+        if with_augment:
+            self.augment_array = _extract(augment, result)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        stored = [name[:-len('_array')] for name in self.__slots__
+                  if getattr(self, name) is not None]
+        return '<FitRecord (%s)>' % ', '.join(stored)
+
+
+def _extract(func, result, **kwargs):
+    """Return the output of `func(result)` as a structured array or None.
+    """
+    try:
+        return func(result, output='numpy', **kwargs)
+    except NotImplementedError:
+        return None
+
+
+def _record_output(func, array, output, compact, kwargs):
+    if kwargs:
+        msg = ('A `FitRecord` stores only the output of `%s` computed when '
+               'it was created: unsupported argument(s) %s. Pass the `tidy` '
+               'arguments to `FitRecord` instead.')
+        raise ValueError(msg % (func.__name__, ', '.join(sorted(kwargs))))
+    if array is None:
+        msg = 'Sorry, this `FitRecord` does not contain `%s` data.'
+        raise NotImplementedError(msg % func.__name__)
+    columns = OrderedDict((name, array[name]) for name in array.dtype.names)
+    return _build_output(columns, output, compact)
+
+
+@tidy.register(FitRecord)
+def tidy_record(record, output='dataframe', compact=False, **kwargs):
+    """Tidy parameters from a :class:`FitRecord`.
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`tidy`.
+
+    Arguments:
+        record (`FitRecord`): the fit record.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        **kwargs: not supported, raise a `ValueError`. The `tidy`
+            arguments (e.g. `what`) must be passed to :class:`FitRecord`.
+
+    Returns:
+        The same output of `tidy` on the original fit result.
+    """
+    return _record_output(tidy, record.tidy_array, output, compact,
+                          kwargs)
+
+
+@glance.register(FitRecord)
+def glance_record(record, output='dataframe', compact=False, **kwargs):
+    """Tidy summary statistics from a :class:`FitRecord`.
+
+    See :func:`tidy_record` for a description of the arguments.
+    """
+    return _record_output(glance, record.glance_array, output, compact,
+                          kwargs)
+
+
+@augment.register(FitRecord)
+def augment_record(record, output='dataframe', compact=False, **kwargs):
+    """Tidy data values and fitted model from a :class:`FitRecord`.
+
+    Available only for records created with `with_augment=True`.
+    See :func:`tidy_record` for a description of the arguments.
+    """
+    return _record_output(augment, record.augment_array, output, compact,
+                          kwargs)
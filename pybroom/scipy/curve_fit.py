@@ -0,0 +1,152 @@
+"""
+Support for the results of `scipy.optimize.curve_fit`.
+
+`curve_fit` returns a plain tuple `(popt, pcov)` (or
+`(popt, pcov, infodict, mesg, ier)` with `full_output=True`), which cannot
+be dispatched by type. :class:`CurveFitResult` is a lightweight wrapper
+accepted by :func:`pybroom.tidy` and :func:`pybroom.glance`::
+
+    >>> result = CurveFitResult(*curve_fit(f, x, y))
+    >>> br.tidy(result, param_names='a b c')
+"""
+from collections import OrderedDict
+import numpy as np
+from .. import glance, tidy
+from ..pybroom import _covariance, _tidy_many
+from ..utils import _build_output, _covariance_columns
+from .optimize import _param_names
+
+
+class CurveFitResult:
+    """Wrapper of the tuple returned by `scipy.optimize.curve_fit`.
+
+    Arguments:
+        popt (array): best-fit parameters values.
+        pcov (2D array): estimated covariance of `popt`.
+        infodict, mesg, ier: additional outputs of `curve_fit` when called
+            with `full_output=True` (optional).
+    """
+    __slots__ = ('popt', 'pcov', 'infodict', 'mesg', 'ier')
+
+    def __init__(self, popt, pcov, infodict=None, mesg=None, ier=None):
+        self.popt = np.atleast_1d(np.asarray(popt, dtype=float))
+        self.pcov = np.asarray(pcov, dtype=float)
+        self.infodict = infodict
+        self.mesg = mesg
+        self.ier = ier
+
+    def __repr__(self):
+        return '<CurveFitResult (%d parameters)>' % len(self.popt)
+
+
+def _tidy_columns(popt, stderr, names):
+    """Tidy columns for stacked `popt` and `stderr` of shape `(n, p)`."""
+    names = np.asarray(names)
+    # Rows are sorted by parameter name
+    index = np.argsort(names, kind='stable')
+    columns = OrderedDict()
+    columns['name'] = np.tile(names[index], len(popt))
+    columns['value'] = popt[:, index].ravel()
+    columns['stderr'] = stderr[:, index].ravel()
+    return columns
+
+
+def _stderr(pcov):
+    """Standard errors from (stacked) covariance matrices."""
+    return np.sqrt(np.diagonal(pcov, axis1=-2, axis2=-1))
+
+
+@tidy.register(CurveFitResult)
+def tidy_curve_fit(result, param_names=None, output='dataframe',
+                   compact=False, what='parameters'):
+    """Tidy parameters data from a :class:`CurveFitResult`.
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`tidy`.
+
+    Arguments:
+        result (`CurveFitResult`): the wrapped `curve_fit` output.
+        param_names (string or list of string, optional): names of the
+            fitted parameters. It can either be a list of strings or a
+            single string with space-separated names. If ``None``, the
+            parameters are named *p0, p1, p2, ..., pn*.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        what (string): `'parameters'` (default) or `'covariance'`, see
+            :func:`pybroom.scipy.optimize.tidy_optimize`.
+
+    Returns:
+        A DataFrame in tidy format with one row for each parameter and
+        columns `name`, `value` and `stderr` (square root of the diagonal
+        of `pcov`).
+    """
+    if what == 'covariance':
+        columns = _covariance_columns(*_covariance_curve_fit(result,
+                                                             param_names))
+        return _build_output(columns, output, compact)
+    elif what != 'parameters':
+        raise ValueError("`what` must be 'parameters' or 'covariance'.")
+    names = _param_names(param_names, len(result.popt))
+    columns = _tidy_columns(result.popt[None], _stderr(result.pcov)[None],
+                            names)
+    return _build_output(columns, output, compact)
+
+
+@_tidy_many.register(CurveFitResult)
+def _tidy_curve_fit_many(result, results, param_names=None,
+                         what='parameters'):
+    """Tidy many :class:`CurveFitResult` from stacked `popt` and `pcov`.
+
+    Return None (i.e. tidy each result separately) when the results have
+    a different number of parameters.
+    """
+    n_params = len(result.popt)
+    if what != 'parameters' or any(len(res.popt) != n_params
+                                   for res in results):
+        return None
+    popt = np.stack([res.popt for res in results])
+    stderr = _stderr(np.stack([res.pcov for res in results]))
+    names = _param_names(param_names, n_params)
+    return (_tidy_columns(popt, stderr, names),
+            np.full(len(results), n_params, dtype=np.intp))
+
+
+@_covariance.register(CurveFitResult)
+def _covariance_curve_fit(result, param_names=None):
+    return _param_names(param_names, len(result.popt)), result.pcov
+
+
+@glance.register(CurveFitResult)
+def glance_curve_fit(result, output='dataframe', compact=False):
+    """Tidy summary statistics from a :class:`CurveFitResult`.
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`glance`.
+
+    Arguments:
+        result (`CurveFitResult`): the wrapped `curve_fit` output.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+
+    Returns:
+        A DataFrame with one row and column `num_params`. When `curve_fit`
+        was called with `full_output=True`, the columns `num_data_points`,
+        `chisqr` (sum of the squared weighted residuals), `nfev`,
+        `success`, `status` and `message` are also present.
+    """
+    columns = OrderedDict()
+    columns['num_params'] = [len(result.popt)]
+    if result.infodict is not None:
+        fvec = np.asarray(result.infodict.get('fvec', ()), dtype=float)
+        columns['num_data_points'] = [fvec.size]
+        columns['chisqr'] = [np.sum(fvec**2)]
+        columns['nfev'] = [result.infodict.get('nfev')]
+    if result.ier is not None:
+        columns['success'] = [result.ier in (1, 2, 3, 4)]
+        columns['status'] = [result.ier]
+        columns['message'] = [result.mesg]
+    return _build_output(columns, output, compact)
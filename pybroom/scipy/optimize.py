@@ -1,13 +1,19 @@
-from collections import namedtuple
+from collections import OrderedDict
 import numpy as np
-import pandas as pd
 import scipy.optimize as so
-from .. import glance, tidy
-from ..utils import dict_to_tidy
+from scipy.sparse.linalg import LinearOperator
+from .. import glance, tidy, augment
+from ..pybroom import _augment_many, _covariance, _tidy_many
+from ..utils import (_build_output, _concat_columns, _covariance_columns,
+                     _covariance_from_jac, _grid_columns, _leverage_from_jac,
+                     _point_arrays, _stack_point_arrays)
 
 
 @tidy.register(so.OptimizeResult)
-def tidy_optimize(result, param_names=None, **kwargs):
+def tidy_optimize(result, param_names=None, output='dataframe',
+                  compact=False, key='name', value='value',
+                  keys_exclude=None, what='parameters', sparse=False, tol=0,
+                  hess_inv_max_matvecs=None):
     """Tidy parameters data from scipy's `OptimizeResult`.
 
     Normally this function is not called directly but invoked by the
@@ -17,10 +23,45 @@ def tidy_optimize(result, param_names=None, **kwargs):
 
     Arguments:
         result (`OptimizeResult`): the fit result object.
-        param_names (string or list of string, optional): names of the
-            fitted parameters. It can either be a list of strings or a
-            single string with space-separated names. If ``None``, the
-            parameters are named *p0, p1, p2, ..., pn*.
+        param_names (string, list of string or array, optional): names of
+            the fitted parameters. It can either be a list (or array) of
+            strings or a single string with space-separated names.
+            If ``None``, the parameters are named *p0, p1, p2, ..., pn*.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        key, value (string): names of the columns containing the parameter
+            names and values.
+        keys_exclude (iterable or None): names of parameters to be excluded.
+        what (string): `'parameters'` (default), `'covariance'`,
+            `'duals'`, `'population'` or `'grid'`. `'covariance'` returns
+            one row for each pair of parameters `(param_i, param_j)` in the
+            upper triangle of the covariance matrix (diagonal included)
+            with columns `cov` and `corr`. The covariance is computed from
+            the Jacobian (`result.jac`) and the residuals (`result.fun`) of
+            `least_squares` results. `'duals'` returns the dual values of
+            `linprog` results, one row per constraint with columns
+            `constraint` (`'eqlin'`, `'ineqlin'`, `'lower'` or `'upper'`),
+            `index`, `marginal` and `residual`. `'population'` returns
+            the final population of `differential_evolution`, one row per
+            member with columns `member`, one column per parameter and
+            `energy`. `'grid'` returns the grid evaluated by
+            `scipy.optimize.brute` (stored in the result as `grid` and
+            `Jout`), one row per grid point with a column per parameter
+            and the column `fun`.
+        sparse (bool): if True, return only the parameters (or the dual
+            values with `what='duals'`) whose absolute value is larger than
+            `tol`, in the order of `result.x`, with an additional column
+            `index` (position in `result.x`). Only the names of the
+            returned parameters are looked up in `param_names` (or built).
+            Useful for large solution vectors (e.g. `linprog`, `milp`).
+        tol (float): threshold used when `sparse` is True.
+        hess_inv_max_matvecs (int or None): maximum number of products
+            between a `hess_inv` linear operator and a vector used to
+            compute `stderr`. When the number of parameters is larger, the
+            diagonal is estimated stochastically from this many random
+            probe vectors. If None (default), the diagonal is exact.
 
     Returns:
         A DataFrame in tidy format with one row for each parameter.
@@ -33,23 +74,269 @@ def tidy_optimize(result, param_names=None, **kwargs):
 
         Optional columns (depending on the type of result) are:
 
+        - `index` (int): position of the parameter in `result.x`
+          (only with `sparse=True`).
+        - `stderr` (float): standard error for each parameter, computed
+          from the Jacobian of `least_squares` results or from the
+          diagonal of the inverse Hessian (`hess_inv`) of `minimize`
+          results. The latter assumes that the objective function is a
+          negative log-likelihood (multiply by sqrt(2) for a chi-square).
+          Only the diagonal of `hess_inv` is computed (the L-BFGS-B
+          operator is never converted to a dense matrix).
         - `grad` (float): gradient for each parameter
         - `active_mask` (int)
     """
-    if param_names is None:
-        n = len(result.x)
-        param_names = ['p{}'.format(i) for i in range(n)]
-    Params = namedtuple('Params', param_names)
-    params = Params(*result.x)
-    df = dict_to_tidy(params._asdict(), **kwargs)
+    if what == 'covariance':
+        columns = _covariance_columns(*_covariance_optimize(result,
+                                                            param_names))
+        return _build_output(columns, output, compact)
+    elif what == 'duals':
+        return _build_output(_duals_columns(result, sparse, tol), output,
+                             compact)
+    elif what == 'population':
+        return _build_output(_population_columns(result, param_names),
+                             output, compact)
+    elif what == 'grid':
+        for attr in ('grid', 'Jout'):
+            if attr not in result:
+                raise ValueError('The fit result has no `%s`.' % attr)
+        Jout = np.asarray(result.Jout)
+        n_params = np.shape(result.grid)[0] if Jout.ndim > 1 else 1
+        columns = _grid_columns(result.grid, Jout,
+                                _param_names(param_names, n_params))
+        return _build_output(columns, output, compact)
+    elif what != 'parameters':
+        raise ValueError("`what` must be 'parameters', 'covariance', "
+                         "'duals', 'population' or 'grid'.")
+    stderr = _stderr_many([result], hess_inv_max_matvecs)[0]
+    columns = _tidy_columns(result, stderr, param_names, key, value,
+                            keys_exclude, sparse, tol)
+    return _build_output(columns, output, compact)
+
+
+def _tidy_columns(result, stderr, param_names, key, value, keys_exclude,
+                  sparse=False, tol=0):
+    """Columns of :func:`tidy_optimize`, with a precomputed `stderr`."""
+    x = np.atleast_1d(result.x)
+    if sparse:
+        index = np.flatnonzero(np.abs(x) > tol)
+        names = _param_names_at(param_names, len(x), index)
+    else:
+        names = np.asarray(_param_names(param_names, len(x)))
+        # Rows are sorted by parameter name
+        index = np.argsort(names, kind='stable')
+        names = names[index]
+    if keys_exclude is not None:
+        keep = ~np.isin(names, list(keys_exclude))
+        index, names = index[keep], names[keep]
+    columns = OrderedDict()
+    columns[key] = names
+    if sparse:
+        columns['index'] = index
+    columns[value] = x[index]
+    if stderr is not None:
+        columns['stderr'] = stderr[index]
     for var in ('grad', 'active_mask'):
         if hasattr(result, var):
-            df[var] = result[var]
-    return df
+            columns[var] = np.asarray(result[var])[index]
+    return columns
+
+
+def _has_jac(result):
+    return 'fun' in result and np.ndim(result.get('jac')) == 2
+
+
+def _stderr_many(results, hess_inv_max_matvecs=None):
+    """Standard errors of the parameters for each result in `results`.
+
+    Results with a Jacobian of the same shape are stacked and processed
+    with a single SVD (see :func:`pybroom.utils._covariance_from_jac`).
+    Results without a Jacobian but with an inverse Hessian (`hess_inv`)
+    use its diagonal (see :func:`_hess_inv_diagonal`). The returned list
+    contains None for results without both.
+    """
+    groups = OrderedDict()
+    stderrs = [None] * len(results)
+    for i, res in enumerate(results):
+        if _has_jac(res):
+            groups.setdefault(np.shape(res.jac), []).append(i)
+        elif res.get('hess_inv') is not None:
+            diag = _hess_inv_diagonal(res.hess_inv, hess_inv_max_matvecs)
+            with np.errstate(invalid='ignore'):
+                stderrs[i] = np.sqrt(diag)
+    for index in groups.values():
+        jac = np.stack([results[i].jac for i in index])
+        fun = np.stack([results[i].fun for i in index])
+        cov = _covariance_from_jac(jac, fun)
+        stderr = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+        for i, err in zip(index, stderr):
+            stderrs[i] = err
+    return stderrs
+
+
+def _hess_inv_diagonal(hess_inv, max_matvecs=None, block=64):
+    """Diagonal of the inverse Hessian without building a dense matrix.
+
+    Arguments:
+        hess_inv (array or `LinearOperator`): the inverse Hessian.
+        max_matvecs (int or None): see :func:`tidy_optimize`.
+        block (int): number of vectors multiplied at once by the operator.
+
+    The diagonal of a dense array is returned directly. For the L-BFGS-B
+    operator the exact diagonal is computed from the compact
+    representation of the L-BFGS matrix in O(n m^2) operations
+    (`m` stored corrections). Other operators are multiplied by blocks of
+    columns of the identity matrix (or by random +/-1 probe vectors when
+    `n > max_matvecs`).
+    """
+    if isinstance(hess_inv, so.LbfgsInvHessProduct):
+        return _lbfgs_diagonal(hess_inv.sk, hess_inv.yk)
+    if not isinstance(hess_inv, LinearOperator):
+        return np.diagonal(np.atleast_2d(hess_inv)).astype(float)
+    n = hess_inv.shape[0]
+    if max_matvecs is None or n <= max_matvecs:
+        diag = np.empty(n)
+        for start in range(0, n, block):
+            index = np.arange(start, min(start + block, n))
+            columns = np.zeros((n, index.size))
+            columns[index, np.arange(index.size)] = 1
+            diag[index] = hess_inv.matmat(columns)[index,
+                                                   np.arange(index.size)]
+        return diag
+    # Stochastic estimate of the diagonal: E[v * (A v)] with v = +/-1
+    rng = np.random.default_rng(0)
+    diag = np.zeros(n)
+    for start in range(0, max_matvecs, block):
+        probes = rng.choice([-1., 1.], size=(n, min(block,
+                                                    max_matvecs - start)))
+        diag += np.sum(probes * hess_inv.matmat(probes), axis=1)
+    return diag / max_matvecs
+
+
+def _lbfgs_diagonal(sk, yk):
+    """Diagonal of the L-BFGS inverse Hessian with initial matrix `I`.
+
+    Uses the compact representation (Byrd, Nocedal and Schnabel, 1994)
+    ``H = I + W M W^T`` with ``W = [S, Y]``, where `M` is a small
+    `(2m, 2m)` matrix, so that ``diag(H) = 1 + sum((W M) * W, axis=1)``.
+    """
+    m = sk.shape[0]
+    if m == 0:
+        return np.ones(sk.shape[1])
+    SY = sk @ yk.T
+    R_inv = np.linalg.inv(np.triu(SY))
+    middle = R_inv.T @ (np.diag(np.diag(SY)) + yk @ yk.T) @ R_inv
+    M = np.block([[middle, -R_inv.T], [-R_inv, np.zeros((m, m))]])
+    W = np.concatenate([sk, yk]).T
+    return 1 + np.einsum('ij,ij->i', W @ M, W)
+
+
+@_tidy_many.register(so.OptimizeResult)
+def _tidy_optimize_many(result, results, param_names=None, key='name',
+                        value='value', keys_exclude=None, what='parameters',
+                        sparse=False, tol=0, hess_inv_max_matvecs=None):
+    """Tidy many `OptimizeResult` computing all the `stderr` at once.
+
+    Return None (i.e. tidy each result separately) for `what` other than
+    `'parameters'`.
+    """
+    if what != 'parameters':
+        return None
+    stderrs = _stderr_many(results, hess_inv_max_matvecs)
+    columns_list = [
+        _tidy_columns(res, stderr, param_names, key, value, keys_exclude,
+                      sparse, tol)
+        for res, stderr in zip(results, stderrs)]
+    lengths = [len(columns[key]) for columns in columns_list]
+    return _concat_columns(columns_list), lengths
+
+
+def _param_names(param_names, n_params):
+    """Return the list of parameters names, see :func:`tidy_optimize`."""
+    if param_names is None:
+        param_names = ['p{}'.format(i) for i in range(n_params)]
+    elif isinstance(param_names, str):
+        param_names = param_names.replace(',', ' ').split()
+    if len(param_names) != n_params:
+        msg = 'Got %d `param_names` but the fit result has %d parameters.'
+        raise ValueError(msg % (len(param_names), n_params))
+    return list(param_names)
+
+
+def _param_names_at(param_names, n_params, index):
+    """Names of the parameters at positions `index` (an array of ints).
+
+    Default names are built only for the requested positions and an array
+    of names is indexed directly, without conversion to list.
+    """
+    if param_names is None:
+        names = np.empty(len(index), dtype=object)
+        names[:] = ['p{}'.format(i) for i in index]
+        return names
+    if isinstance(param_names, str):
+        param_names = param_names.replace(',', ' ').split()
+    param_names = np.asarray(param_names)
+    if len(param_names) != n_params:
+        msg = 'Got %d `param_names` but the fit result has %d parameters.'
+        raise ValueError(msg % (len(param_names), n_params))
+    return param_names[index]
+
+
+def _population_columns(result, param_names=None):
+    """Final population of a `differential_evolution` result."""
+    for attr in ('population', 'population_energies'):
+        if attr not in result:
+            raise ValueError('The fit result has no `%s`.' % attr)
+    population = np.atleast_2d(result.population)
+    columns = OrderedDict()
+    columns['member'] = np.arange(population.shape[0])
+    names = _param_names(param_names, population.shape[1])
+    for name, values in zip(names, population.T):
+        columns[name] = values
+    columns['energy'] = np.asarray(result.population_energies)
+    return columns
+
+
+def _duals_columns(result, sparse=False, tol=0):
+    """Dual values (marginals) of the constraints of a `linprog` result."""
+    columns_list = []
+    for name in ('eqlin', 'ineqlin', 'lower', 'upper'):
+        duals = result.get(name)
+        if duals is None:
+            continue
+        marginals = np.atleast_1d(np.asarray(duals.marginals, dtype=float))
+        if sparse:
+            index = np.flatnonzero(np.abs(marginals) > tol)
+        else:
+            index = np.arange(marginals.size)
+        constraint = np.empty(index.size, dtype=object)
+        constraint[:] = name
+        columns = OrderedDict()
+        columns['constraint'] = constraint
+        columns['index'] = index
+        columns['marginal'] = marginals[index]
+        columns['residual'] = np.atleast_1d(
+            np.asarray(duals.residual, dtype=float))[index]
+        columns_list.append(columns)
+    if not columns_list:
+        raise ValueError('The fit result has no dual values (as returned '
+                         'by `linprog` with the HiGHS methods).')
+    return _concat_columns(columns_list)
+
+
+@_covariance.register(so.OptimizeResult)
+def _covariance_optimize(result, param_names=None):
+    """Return `(param_names, cov)` computed from `result.jac`."""
+    jac = np.asarray(result.get('jac', ()), dtype=float)
+    if jac.ndim != 2 or 'fun' not in result:
+        raise ValueError('Covariance requires a 2D `jac` and the residuals '
+                         '`fun` (as returned by `least_squares`).')
+    names = _param_names(param_names, jac.shape[1])
+    return names, _covariance_from_jac(jac, result.fun)
 
 
 @glance.register(so.OptimizeResult)
-def glance_optimize(result):
+def glance_optimize(result, output='dataframe', compact=False):
     """Tidy summary statistics from scipy's `OptimizeResult`.
 
     Normally this function is not called directly but invoked by the
@@ -57,6 +344,10 @@ def glance_optimize(result):
 
     Arguments:
         result (`OptimizeResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
 
     Returns:
         A DataFrame in tidy format with one row and several summary statistics
@@ -75,12 +366,99 @@ def glance_optimize(result):
         - `status` (int): status returned by the fit routine
         - `message` (string): message returned by the fit routine
     """
-    attr_names_all = ['success', 'cost', 'optimality', 'nfev', 'njev', 'nit'
+    attr_names_all = ['success', 'cost', 'optimality', 'nfev', 'njev', 'nit',
                       'status', 'message']
     attr_names = [a for a in attr_names_all if hasattr(result, a)]
     if hasattr(result, 'fun') and np.size(result.fun) == 1:
         attr_names.append('fun')
-    d = pd.DataFrame(index=range(1), columns=attr_names)
+    columns = OrderedDict()
     for attr_name in attr_names:
-        d.loc[0, attr_name] = getattr(result, attr_name)
-    return d.apply(pd.to_numeric, errors='ignore')
+        # `fun` may be a 1-element array
+        columns[attr_name] = [np.asarray(getattr(result, attr_name)).item()]
+    return _build_output(columns, output, compact)
+
+
+@augment.register(so.OptimizeResult)
+def augment_optimize(result, output='dataframe', compact=False, x=None,
+                     data=None, leverage=False):
+    """Tidy residuals from scipy's `OptimizeResult` (e.g. `least_squares`).
+
+    Normally this function is not called directly but invoked by the
+    general purpose function :func:`augment`. The residuals are taken from
+    `result.fun`, the data and the independent variable can be optionally
+    passed as arguments.
+
+    Arguments:
+        result (`OptimizeResult`): the fit result object.
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        x, data (array or None): independent variable and data with the
+            same size of `result.fun`. When augmenting a collection of
+            results, they can also be 2D arrays with one row per result.
+        leverage (bool): if True, add the column `leverage` with the
+            diagonal of the hat matrix computed from `result.jac`.
+
+    Returns:
+        A DataFrame with one row for each residual with columns `x` and
+        `data` (if passed), `residual` and `leverage` (if requested).
+        A ValueError is raised for results without residuals (e.g. the
+        scalar `fun` of `minimize` or `linprog` results).
+    """
+    residual = _residual(result)
+    columns = _point_arrays(OrderedDict([('x', x), ('data', data)]),
+                            residual.size)
+    columns['residual'] = residual
+    if leverage:
+        columns['leverage'] = _leverage_many([result])[0]
+    return _build_output(columns, output, compact)
+
+
+def _residual(result):
+    """Return the residual vector `result.fun` of a `least_squares` result.
+    """
+    residual = np.asarray(result.fun, dtype=float)
+    if residual.ndim != 1:
+        raise ValueError('`augment` requires a residual vector in '
+                         '`result.fun` (e.g. a `least_squares` result), '
+                         'found an array with shape %s (e.g. the objective '
+                         'value of `minimize`).' % (residual.shape,))
+    return residual
+
+
+def _leverage_many(results):
+    """Leverage of each residual for each result in `results`.
+
+    Results with a Jacobian of the same shape are processed with a single
+    stacked SVD. Results without a Jacobian get NaN leverages.
+    """
+    groups = OrderedDict()
+    for i, res in enumerate(results):
+        if _has_jac(res):
+            groups.setdefault(np.shape(res.jac), []).append(i)
+    leverages = [np.full(np.size(res.fun), np.nan) for res in results]
+    for index in groups.values():
+        stacked = _leverage_from_jac(np.stack([results[i].jac
+                                               for i in index]))
+        for i, values in zip(index, stacked):
+            leverages[i] = values
+    return leverages
+
+
+@_augment_many.register(so.OptimizeResult)
+def _augment_optimize_many(result, results, x=None, data=None,
+                           leverage=False):
+    """Augment many `OptimizeResult` from stacked arrays.
+
+    The residuals are concatenated and the leverages are computed with
+    one stacked SVD for each Jacobian shape.
+    """
+    residuals = [_residual(res) for res in results]
+    lengths = np.array([r.size for r in residuals], dtype=np.intp)
+    columns = _stack_point_arrays(OrderedDict([('x', x), ('data', data)]),
+                                  lengths)
+    columns['residual'] = np.concatenate(residuals)
+    if leverage:
+        columns['leverage'] = np.concatenate(_leverage_many(results))
+    return columns, lengths
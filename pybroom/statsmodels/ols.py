@@ -1,30 +1,52 @@
 from collections import OrderedDict
 import numpy as np
-import pandas as pd
 import statsmodels.api as sm
 import statsmodels.formula.api as smf
 from .. import glance, tidy, augment
+from ..utils import _build_output, decimation_index
 
 
 @tidy.register(sm.regression.linear_model.RegressionResultsWrapper)
-def tidy_statsmodels(result):
+def tidy_statsmodels(result, output='dataframe', compact=False):
     """Tidy statsmodels `smf.ols` or `sm.OLS` fitted result.
 
     Arguments:
         result: the fit result object (`RegressionResultsWrapper`).
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
 
     Returns:
         A DataFrame in tidy format with one row for each parameter.
+
+    Note:
+        The columns of the returned DataFrame are (as in R `broom::tidy`):
+
+        - `term` (string): name of the regressor.
+        - `estimate` (float): estimated coefficient.
+        - `std_error` (float): standard error of the coefficient.
+        - `statistic` (float): t-statistic of the coefficient.
+        - `p_value` (float): two-sided p-value of the t-statistic.
     """
-    pass
+    columns = OrderedDict([('term', list(result.model.exog_names)),
+                           ('estimate', np.asarray(result.params)),
+                           ('std_error', np.asarray(result.bse)),
+                           ('statistic', np.asarray(result.tvalues)),
+                           ('p_value', np.asarray(result.pvalues))])
+    return _build_output(columns, output, compact)
 
 
 @glance.register(sm.regression.linear_model.RegressionResultsWrapper)
-def glance_statsmodels(result):
+def glance_statsmodels(result, output='dataframe', compact=False):
     """Glance statsmodels `sm.OLS` or `smf.ols` fitted result.
 
     Arguments:
         result: the fit result object (`RegressionResultsWrapper`).
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
 
     Returns:
         A DataFrame in tidy format with one row and several summary statistics
@@ -37,23 +59,31 @@ def glance_statsmodels(result):
         R `broom::glance` for `ols` equivalent `lm` also includes sigma,
         log_likelihood, and deviance.
     """
-    df = pd.DataFrame({'r_squared': result.rsquared,
-                       'adj_r_squared': result.rsquared_adj,
-                       'statistic': result.fvalue,
-                       'p_value': result.f_pvalue,
-                       'df': result.df_model,
-                       'df_residual': result.df_resid,
-                       'aic': result.aic,
-                       'bic': result.bic}, index=range(1))
-    return df
+    columns = OrderedDict([('r_squared', [result.rsquared]),
+                           ('adj_r_squared', [result.rsquared_adj]),
+                           ('statistic', [result.fvalue]),
+                           ('p_value', [result.f_pvalue]),
+                           ('df', [result.df_model]),
+                           ('df_residual', [result.df_resid]),
+                           ('aic', [result.aic]),
+                           ('bic', [result.bic])])
+    return _build_output(columns, output, compact)
 
 
 @augment.register(sm.regression.linear_model.RegressionResultsWrapper)
-def augment_statsmodels(result):
+def augment_statsmodels(result, output='dataframe', compact=False,
+                        max_points=None, stride=None, method='uniform'):
     """Augment statsmodels `sm.OLS` or `smf.ols` fitted result.
 
     Arguments:
         result: the fit result object (`RegressionResultsWrapper`).
+        output (string): type of the returned object, one of `'dataframe'`,
+            `'numpy'`, `'records'` or `'dict'`.
+        compact (bool or string): if True, return memory-lean column types
+            (see :func:`pybroom.utils.compact_columns`).
+        max_points, stride, method: decimate the returned rows, see
+            :func:`pybroom.utils.decimation_index`. Rows are selected
+            (using the dependent variable) before building the output.
 
     Returns:
         A DataFrame of the original data and additional columns such as
@@ -63,17 +93,18 @@ def augment_statsmodels(result):
         All attributes returned:
         https://www.statsmodels.org/stable/generated/statsmodels.regression.linear_model.RegressionResults.html?highlight=regression%20linear_model%20regressionresults
     """
-    design = pd.DataFrame(result.model.exog, columns=result.model.exog_names)
-    X = design.drop('Intercept', axis=1)
-    y = pd.Series(result.model.endog, name=result.model.endog_names)
-
-    estimated_values = pd.DataFrame({'_fitted': result.fittedvalues,
-                                     '_se_fit': np.nan,
-                                     '_resid': result.resid})
-
-    estimated_values = (estimated_values
-                        .reset_index()
-                        .drop('index', axis=1))
-
-    df = pd.concat([y, X, estimated_values], axis=1, sort=False)
-    return df
+    model = result.model
+    endog = np.asarray(model.endog)
+    index = decimation_index(endog, None, max_points, stride, method)
+    if index is None:
+        index = slice(None)
+    columns = OrderedDict()
+    columns[model.endog_names] = endog[index]
+    exog = np.asarray(model.exog)[index]
+    for i, name in enumerate(model.exog_names):
+        if name != 'Intercept':
+            columns[name] = exog[:, i]
+    columns['_fitted'] = np.asarray(result.fittedvalues)[index]
+    columns['_se_fit'] = np.full(len(exog), np.nan)
+    columns['_resid'] = np.asarray(result.resid)[index]
+    return _build_output(columns, output, compact)
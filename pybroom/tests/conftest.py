@@ -61,6 +61,25 @@ class BaseTest:
         assert len(df) == self.n
         assert len(df.columns) > 0
 
+    def test_output_numpy(self):
+        """
+        Test output='numpy' and output='records' against the DataFrame
+        """
+        for func in (tidy, glance, augment):
+            try:
+                df = func(self.result)
+            except NotImplementedError:
+                continue
+            if df is None:
+                continue
+            arr = func(self.result, output='numpy')
+            records = func(self.result, output='records')
+            assert isinstance(arr, np.ndarray)
+            assert arr.dtype.names == tuple(df.columns)
+            assert len(arr) == len(df)
+            assert len(records) == len(df)
+            assert list(records[0]) == list(df.columns)
+
     @property
     def _result(self):
         """
@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import lmfit
+
+import pybroom as br
+
+N = 30
+x = np.linspace(-10, 10, N)
+random_state = np.random.RandomState(123)
+datasets = {'d%d' % i: x * i + random_state.randn(N)/3 + 3 for i in range(5)}
+
+model = lmfit.models.LinearModel()
+results = {k: model.fit(y, x=x) for k, y in datasets.items()}
+
+
+async def _delayed(result, delay):
+    await asyncio.sleep(delay)
+    return result
+
+
+def _awaitables():
+    # Results complete in reverse key order
+    return {k: _delayed(res, 0.01 * (len(results) - i))
+            for i, (k, res) in enumerate(results.items())}
+
+
+def test_atidy():
+    expected = br.tidy(results, var_names='dataset')
+    df = asyncio.run(br.atidy(_awaitables(), var_names='dataset'))
+    pd.testing.assert_frame_equal(df, expected)
+    df = asyncio.run(br.aglance(_delayed(results['d1'], 0)))
+    pd.testing.assert_frame_equal(df, br.glance(results['d1']))
+    # Same layouts and batch implementations of the synchronous functions
+    df = asyncio.run(br.atidy(_awaitables(), var_names='dataset',
+                              layout='wide'))
+    pd.testing.assert_frame_equal(
+        df, br.tidy(results, var_names='dataset', layout='wide'))
+    df = asyncio.run(br.aaugment(_awaitables(), var_names='dataset'))
+    pd.testing.assert_frame_equal(
+        df, br.augment(results, var_names='dataset'))
+
+
+def test_aaugment_futures():
+    async def main():
+        with ThreadPoolExecutor(2) as pool:
+            futures = [pool.submit(model.fit, y, x=x)
+                       for y in datasets.values()]
+            futures[0] = results['d0']   # mixed with ready results
+            return await br.aaugment(futures, output='dict')
+    out = asyncio.run(main())
+    expected = br.augment(list(results.values()), output='dict')
+    for name in expected:
+        np.testing.assert_allclose(out[name], expected[name])
+
+
+def test_aiter_chunks():
+    async def main():
+        return [chunk async for chunk in
+                br.aiter_chunks(_awaitables(), 'glance', chunksize=2)]
+    chunks = asyncio.run(main())
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert list(chunks[0]['key']) == ['d4', 'd3']
+    df = pd.concat(chunks).sort_values('key').reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, br.glance(results),
+                                  check_categorical=False)
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def test_atidy_as_completed():
+    async def slow(result, executor):
+        # Completes only after the other results have been tidied
+        while executor.submitted < len(results) - 1:
+            await asyncio.sleep(0.01)
+        return result
+
+    async def main(executor, **kwargs):
+        awaitables = dict(results)
+        awaitables['d0'] = slow(results['d0'], executor)
+        return await asyncio.wait_for(
+            br.aglance(awaitables, executor=executor, **kwargs), 5)
+
+    with _CountingExecutor(2) as executor:
+        df = asyncio.run(main(executor))
+    pd.testing.assert_frame_equal(df, br.glance(results))
+    # Batch implementations are opt-in
+    df = asyncio.run(br.atidy(_awaitables(), batch=True))
+    pd.testing.assert_frame_equal(df, br.tidy(results))
+
+
+def test_aiter_chunks_single():
+    async def main():
+        return [chunk async for chunk in
+                br.aiter_chunks(_delayed(results['d1'], 0), 'tidy')]
+    chunks = asyncio.run(main())
+    assert len(chunks) == 1
+    pd.testing.assert_frame_equal(chunks[0], br.tidy(results['d1']))
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import statsmodels.formula.api as smf
+
+import pybroom as br
+
+random_state = np.random.RandomState(123)
+sizes = [12, 20, 15]
+data = pd.DataFrame({'group': np.repeat(['a', 'b', 'c'], sizes)})
+data['x1'] = random_state.randn(len(data))
+data['x2'] = random_state.randn(len(data))
+data['y'] = 1 + 2 * data.x1 - data.x2 + random_state.randn(len(data))
+data = data.sample(frac=1, random_state=random_state)
+
+
+def test_batch_ols_matches_statsmodels():
+    out = br.batch_ols(data, 'y', ['x1', 'x2'], 'group',
+                       what=('glance', 'tidy', 'augment'))
+    results = {k: smf.ols('y ~ x1 + x2', data=d).fit()
+               for k, d in data.groupby('group')}
+    for name in ('glance', 'tidy'):
+        expected = getattr(br, name)(results, var_names='group')
+        pd.testing.assert_frame_equal(out[name], expected, check_dtype=False)
+    expected = br.augment(results, var_names='group')
+    assert list(out['augment'].columns) == list(expected.columns)
+    np.testing.assert_allclose(out['augment']['_resid'],
+                               expected['_resid'], atol=1e-12)
+
+
+def test_batch_ols_no_intercept():
+    df = br.batch_ols(data, 'y', 'x1', 'group', what='tidy', intercept=False,
+                      var_names='g', output='numpy')
+    assert len(df) == 3
+    assert set(df['term']) == {'x1'}
+    assert list(df['g']) == ['a', 'b', 'c']
+
+
+def test_batch_ols_rank_deficient():
+    bad = pd.DataFrame({'group': ['d'] * 5 + ['e'],
+                        'x1': [1.] * 5 + [0.5], 'x2': np.arange(6.),
+                        'y': np.arange(6.)})
+    out = br.batch_ols(pd.concat([data, bad]), 'y', ['x1', 'x2'], 'group',
+                       what=('glance', 'tidy', 'augment'))
+    expected = br.batch_ols(data, 'y', ['x1', 'x2'], 'group')
+    for name in ('glance', 'tidy'):
+        df = out[name]
+        pd.testing.assert_frame_equal(
+            df[df.group.isin(['a', 'b', 'c'])].drop(columns='group'),
+            expected[name].drop(columns='group'))
+        stats = df[df.group.isin(['d', 'e'])].drop(
+            columns=['group', 'term', 'df', 'df_residual'], errors='ignore')
+        assert stats.isnull().all().all()
+    assert out['augment'][out['augment'].group == 'd']._resid.isnull().all()
+
+
+t = np.linspace(0, 5, 30)
+params_true = np.column_stack([random_state.uniform(1, 3, 10),
+                               random_state.uniform(0.5, 2, 10)])
+Y = (params_true[:, :1] * np.exp(-params_true[:, 1:] * t) +
+     random_state.randn(10, 30) * 0.02)
+
+
+def decay(p, t, y):
+    return p[:, :1] * np.exp(-p[:, 1:] * t) - y
+
+
+def test_batch_least_squares_matches_scipy():
+    from scipy.optimize import least_squares
+    result = br.batch_least_squares(decay, [1, 1], args=(t, Y))
+    assert len(result) == 10
+    assert result.success.all()
+    for i in range(len(result)):
+        ref = least_squares(lambda p: decay(p[None], t, Y[i])[0], [1, 1],
+                            method='lm')
+        np.testing.assert_allclose(result.x[i], ref.x, rtol=1e-5)
+    tidy = br.tidy(result, param_names='a b')
+    expected = br.tidy([result[i] for i in range(len(result))],
+                       param_names='a b')
+    pd.testing.assert_frame_equal(tidy, expected, check_dtype=False)
+    glance = br.glance(result, var_names='problem')
+    assert len(glance) == 10
+    assert list(glance['problem']) == list(range(10))
+    augment = br.augment(result, x=t, leverage=True)
+    expected = br.augment([result[i] for i in range(len(result))], x=t,
+                          leverage=True)
+    pd.testing.assert_frame_equal(augment, expected, check_dtype=False)
+
+
+def decay_jac(p, t, y):
+    e = np.exp(-p[:, 1:] * t)
+    return np.stack([e, -p[:, :1] * t * e], axis=-1)
+
+
+def test_batch_least_squares_masking():
+    x0 = np.ones((10, 2))
+    result = br.batch_least_squares(decay, x0, jac=decay_jac, args=(t, Y),
+                                    max_nfev=3)
+    assert (result.status == 0).all()
+    assert (result.nfev == 3).all()
+    result = br.batch_least_squares(decay, params_true, jac=decay_jac,
+                                    args=(t, Y))
+    assert result.nfev.max() < 20
+    # Finite-difference Jacobians count 2 evaluations each in nfev
+    result_fd = br.batch_least_squares(decay, params_true, args=(t, Y))
+    np.testing.assert_allclose(result_fd.x, result.x, rtol=1e-5)
+    assert (result_fd.nfev >= 1 + 2 * result_fd.njev).all()
+    # A problem already at the optimum is frozen before any step
+    Y_exact = Y.copy()
+    Y_exact[0] = decay(params_true[:1], t, 0)[0]
+    result = br.batch_least_squares(decay, params_true, jac=decay_jac,
+                                    args=(t, Y_exact))
+    assert result.status[0] == 1 and result.nfev[0] == 1
+    np.testing.assert_array_equal(result.x[0], params_true[0])
@@ -0,0 +1,108 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import lmfit
+
+import pybroom as br
+
+N = 30
+x = np.linspace(-10, 10, N)
+random_state = np.random.RandomState(7)
+datasets = {'d%d' % i: x * i + random_state.randn(N)/3 + 3 for i in range(4)}
+
+model = lmfit.models.LinearModel()
+results = {k: model.fit(y, x=x) for k, y in datasets.items()}
+
+
+def test_cache_hit(tmpdir):
+    cache = br.TidyCache(str(tmpdir), format='npy')
+    for func in ('tidy', 'glance', 'augment'):
+        expected = getattr(br, func)(results, var_names='dataset')
+        df = getattr(cache, func)(results, var_names='dataset')
+        pd.testing.assert_frame_equal(df, expected)
+        # Results unpickled from disk are read from the cache
+        results2 = pickle.loads(pickle.dumps(results))
+        df = getattr(cache, func)(results2, var_names='dataset')
+        pd.testing.assert_frame_equal(df, expected)
+    assert len(os.listdir(str(tmpdir))) == 3 * len(results)
+
+    # Different arguments are cached separately
+    cache.tidy(results['d1'], what='covariance')
+    assert len(os.listdir(str(tmpdir))) == 3 * len(results) + 1
+
+
+def test_cache_mmap(tmpdir):
+    cache = br.TidyCache(str(tmpdir), format='npy')
+    cache.glance(results['d2'], output='dict')
+    d = cache.glance(results['d2'], output='dict')
+    assert isinstance(d['chisqr'].base, np.memmap)
+    assert d['method'][0] == results['d2'].method
+    cache.augment(results['d2'], output='dict')
+    d = cache.augment(results['d2'], output='dict')
+    assert isinstance(d['x'].base, np.memmap)
+    np.testing.assert_array_equal(d['best_fit'], results['d2'].best_fit)
+
+
+def test_cache_eviction(tmpdir):
+    cache = br.TidyCache(str(tmpdir), format='npy', max_bytes=None)
+    cache.augment(results['d0'])
+    size = cache.size()
+    cache.max_bytes = 2 * size
+    for k in ('d1', 'd2', 'd3'):
+        cache.augment(results[k])
+    assert cache.size() <= cache.max_bytes
+    assert len(os.listdir(str(tmpdir))) == 2
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_cache_key_functions(tmpdir):
+    import copy
+
+    def make_line(k):
+        def line(x, a):
+            return k * a * x
+        return line
+
+    cache = br.TidyCache(str(tmpdir), format='npy')
+    result = lmfit.Model(make_line(1)).fit(datasets['d1'], x=x, a=1)
+    # Same content, different model functions with the same name
+    for func in (make_line(2), lambda x, a: a * x, lambda x, a: a * x**2):
+        other = copy.copy(result)
+        other.model = lmfit.Model(func)
+        cache.tidy(other)
+    cache.tidy(result)
+    assert len(os.listdir(str(tmpdir))) == 4
+
+
+class Line:
+    """Callable instance used as a model function."""
+    def __init__(self, k):
+        self.k = k
+
+    def __call__(self, x, a):
+        return self.k * a * x
+
+
+def test_cache_key_callable_instance():
+    from pybroom.cache import _code_id
+    # Stable across copies (e.g. in another process), no memory address
+    line = Line(2)
+    assert _code_id(pickle.loads(pickle.dumps(line))) == _code_id(line)
+    assert _code_id(Line(3)) != _code_id(line)
+    assert _code_id(np.sin) != _code_id(np.cos)
+
+
+def test_cache_evicted_while_reading(tmpdir, monkeypatch):
+    from pybroom import cache as cache_module
+
+    cache = br.TidyCache(str(tmpdir), format='npy')
+    expected = cache.glance(results['d0'])
+
+    def _read(path, format):
+        os.remove(path)
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(cache_module, '_read', _read)
+    pd.testing.assert_frame_equal(cache.glance(results['d0']), expected)
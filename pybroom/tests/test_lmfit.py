@@ -1,5 +1,8 @@
 import numpy as np
 import lmfit
+import pandas as pd
+import pytest
+import pybroom as br
 
 from .conftest import BaseTest
 
@@ -27,3 +30,275 @@ class TestModelsDict(BaseTest):
     n = {'m1': N, 'm2': N}
     result = {'m1': model1.fit(y, x=x),
               'm2': model2.fit(y, x=x)}
+
+
+class TestFitRecordList(BaseTest):
+    n = [N, N]
+    result = [br.FitRecord(model1.fit(y, x=x), with_augment=True),
+              br.FitRecord(model2.fit(y, x=x), with_augment=True)]
+
+
+def test_augment_x_eval():
+    grid = np.linspace(-12, 12, 7)
+    results = {'m1': model1.fit(y, x=x), 'm2': model2.fit(y, x=x),
+               'm3': model1.fit(y + 1, x=x)}
+    df = br.augment(results, x_eval=grid)
+    assert len(df) == 3 * len(grid)
+    assert list(df.columns) == ['x', 'best_fit', 'key']
+    for key, res in results.items():
+        np.testing.assert_allclose(df.loc[df.key == key, 'best_fit'],
+                                   res.eval(x=grid))
+    single = br.augment(results['m2'], x_eval=grid)
+    np.testing.assert_allclose(single['best_fit'],
+                               df.loc[df.key == 'm2', 'best_fit'])
+
+
+def test_augment_x_eval_same_repr():
+    def make_line(scale):
+        def line(x, a):
+            # Reduces over the parameter arrays: does not broadcast
+            return scale * np.ravel(x) * np.mean(a)
+        return line
+
+    grid = np.linspace(-12, 12, 7)
+    # Different functions with the same name (and model repr)
+    results = [lmfit.Model(make_line(s)).fit(y, x=x, a=1) for s in (1, 2)]
+    results.append(lmfit.Model(make_line(1)).fit(2 * y, x=x, a=1))
+    assert len(set(repr(res.model) for res in results)) == 1
+    df = br.augment(results, x_eval=grid)
+    for key, res in enumerate(results):
+        np.testing.assert_allclose(df.loc[df.key == key, 'best_fit'],
+                                   res.eval(x=grid))
+
+
+def test_augment_decimation():
+    result = model2.fit(y, x=x)
+    full = br.augment(result)
+    for method in ('uniform', 'minmax', 'lttb'):
+        df = br.augment(result, max_points=10, method=method)
+        assert len(df) <= 10
+        assert df['x'].is_monotonic_increasing
+        merged = df.merge(full, on='x', suffixes=('', '_full'))
+        np.testing.assert_allclose(merged['data'], merged['data_full'])
+    df = br.augment([result, result], stride=5)
+    assert len(df) == 2 * N // 5
+    for kws in ({'max_points': 10}, {'stride': 5}):
+        with pytest.raises(ValueError, match='x_eval'):
+            br.augment(result, x_eval=x[::2], **kws)
+        with pytest.raises(ValueError, match='x_eval'):
+            br.augment([result, result], x_eval=x[::2], **kws)
+
+
+def test_tidy_covariance():
+    res1 = model1.fit(y, x=x)
+    res2 = model2.fit(y, x=x)
+    df = br.tidy(res2, what='covariance')
+    assert list(df.columns) == ['param_i', 'param_j', 'cov', 'corr']
+    assert len(df) == 6
+    for _, row in df.iterrows():
+        i, j = (res2.var_names.index(row.param_i),
+                res2.var_names.index(row.param_j))
+        assert row['cov'] == res2.covar[i, j]
+    diag = df[df.param_i == df.param_j]
+    np.testing.assert_allclose(diag['corr'], 1)
+    np.testing.assert_allclose(
+        np.sqrt(diag['cov']), [res2.params[n].stderr for n in diag.param_i])
+    dfm = br.tidy({'m1': res1, 'm2': res2}, what='covariance')
+    assert len(dfm) == 3 + 6
+    cov, names = br.covariance_array([res1, res2])
+    assert cov.shape == (2, 5, 5)
+    assert names == res1.var_names + res2.var_names
+    ia, ib = names.index('a'), names.index('b')
+    assert np.isnan(cov[0, ia]).all()
+    assert cov[1, ib, ia] == res2.covar[res2.var_names.index('b'),
+                                        res2.var_names.index('a')]
+
+
+def test_tidy_conf_int():
+    result = model1.fit(y, x=x)
+    ci = lmfit.conf_interval(result, result, sigmas=[1, 2])
+    df = br.tidy(result, conf_int=[2, 1])
+    assert list(df.columns[-4:]) == ['ci_lower_1sigma', 'ci_upper_1sigma',
+                                     'ci_lower_2sigma', 'ci_upper_2sigma']
+    for _, row in df.iterrows():
+        assert row.ci_lower_2sigma == ci[row['name']][0][1]
+        assert row.ci_upper_1sigma == ci[row['name']][3][1]
+    dfl = br.tidy([result, result], conf_int=[1, 2], n_jobs=2)
+    assert len(dfl) == 2 * len(df)
+    np.testing.assert_allclose(dfl.loc[dfl.key == 1, df.columns[-4:]],
+                               df[df.columns[-4:]])
+
+
+def _emcee_like_result(n_steps=40, n_walkers=6):
+    result = lmfit.minimizer.MinimizerResult()
+    result.method = 'emcee'
+    result.var_names = ['a', 'b']
+    result.chain = random_state.randn(n_steps, n_walkers, 2) + [1, 10]
+    return result
+
+
+def test_tidy_posterior(tmpdir):
+    result = _emcee_like_result()
+    flat = result.chain[5::2].reshape(-1, 2)
+    df = br.tidy(result, what='posterior', burn=5, thin=2, chunksize=7)
+    assert list(df.columns) == ['sample', 'name', 'value']
+    assert len(df) == flat.size
+    np.testing.assert_array_equal(df['value'], flat.ravel())
+    np.testing.assert_array_equal(df['sample'], np.arange(flat.size) // 2)
+    np.testing.assert_array_equal(df['name'][:4], ['a', 'b', 'a', 'b'])
+    summary = br.tidy(result, what='posterior', burn=5, thin=2,
+                      quantiles=[0.5, 0.975])
+    assert list(summary.columns) == ['name', 'mean', 'std', 'q0.5', 'q0.975']
+    np.testing.assert_allclose(summary['q0.5'], np.median(flat, axis=0))
+    np.testing.assert_allclose(summary['mean'], flat.mean(axis=0))
+    path = str(tmpdir.join('posterior.npy'))
+    arr = br.tidy(result, what='posterior', burn=5, thin=2, sink=path,
+                  chunksize=7)
+    assert isinstance(arr, np.memmap)
+    np.testing.assert_array_equal(arr['value'], flat.ravel())
+    np.testing.assert_array_equal(arr['name'], df['name'])
+    glance = br.glance(result)
+    assert np.isnan(glance['chisqr'][0])
+    # Each result of a collection would overwrite the same file
+    with pytest.raises(ValueError):
+        br.tidy([result, result], what='posterior', sink=path)
+
+
+def test_tidy_posterior_parquet(tmpdir):
+    pq = pytest.importorskip('pyarrow.parquet')
+    result = _emcee_like_result()
+    path = str(tmpdir.join('posterior.parquet'))
+    assert br.tidy(result, what='posterior', sink=path, chunksize=7) == path
+    table = pq.read_table(path)
+    assert table.column_names == ['sample', 'name', 'value']
+    np.testing.assert_array_equal(table.column('value').to_numpy(),
+                                  result.chain.ravel())
+    assert table.column('name').to_pylist()[:2] == ['a', 'b']
+
+
+def test_tidy_posterior_emcee():
+    pytest.importorskip('emcee')
+
+    def residual(params):
+        return params['slope'] * x + params['intercept'] - y
+
+    params = model1.make_params(slope=1, intercept=3)
+    result = lmfit.minimize(residual, params, method='emcee', steps=40,
+                            nwalkers=10, burn=10, thin=2, seed=1,
+                            progress=False)
+    df = br.tidy(result, what='posterior')
+    flat = result.flatchain.to_numpy()
+    assert len(df) == flat.size
+    np.testing.assert_array_equal(df['value'], flat.ravel())
+    np.testing.assert_array_equal(df['name'][:2], result.var_names)
+    summary = br.tidy(result, what='posterior', quantiles=[0.5])
+    np.testing.assert_allclose(summary['q0.5'], np.median(flat, axis=0))
+
+
+def test_augment_minimizer():
+    def residual(params, x, y):
+        return params['slope'] * x + params['intercept'] - y
+
+    params = model1.make_params(slope=1, intercept=0)
+    res1 = lmfit.minimize(residual, params, args=(x, y))
+    res2 = lmfit.minimize(residual, params, args=(x, 2 * y))
+    df = br.augment(res1)
+    assert list(df.columns) == ['residual']
+    np.testing.assert_array_equal(df['residual'], res1.residual)
+    cols = br.augment(res1, x=x, data=y, output='dict')
+    assert list(cols) == ['x', 'data', 'residual']
+    assert np.shares_memory(cols['residual'], res1.residual)
+    df = br.augment([res1, res2], x=x, data=np.vstack([y, 2 * y]))
+    assert len(df) == 2 * N
+    np.testing.assert_array_equal(df.loc[df.key == 1, 'data'], 2 * y)
+    np.testing.assert_array_equal(df.loc[df.key == 1, 'residual'],
+                                  res2.residual)
+    df = br.augment([res1, res2], x=x, stride=5)
+    assert len(df) == 2 * N // 5
+    # Per-result 2D x and data with decimation
+    df = br.augment([res1, res2], x=np.vstack([x, x + 1]),
+                    data=np.vstack([y, 2 * y]), stride=5)
+    assert len(df) == 2 * N // 5
+    np.testing.assert_array_equal(df.loc[df.key == 1, 'x'], x[::5] + 1)
+    np.testing.assert_array_equal(df.loc[df.key == 1, 'data'], 2 * y[::5])
+
+
+def test_augment_2d():
+    def plane(x, y, a, b):
+        return a * x + b * y
+
+    model = lmfit.Model(plane, independent_vars=['x', 'y']) + \
+        lmfit.models.ConstantModel()
+    xx, yy = np.meshgrid(np.arange(8.), np.arange(6.))
+    zz = 2 * xx - yy + 1 + random_state.randn(*xx.shape) / 10
+    result = model.fit(zz, x=xx, y=yy, a=1, b=1, c=0)
+    cols = br.augment(result, output='dict')
+    comps = [c.name for c in result.components]
+    assert list(cols) == ['x', 'y', 'data', 'best_fit', 'residual'] + comps
+    assert np.shares_memory(cols['x'], xx)
+    np.testing.assert_array_equal(cols['data'], zz.ravel())
+    np.testing.assert_allclose(cols['best_fit'],
+                               cols[comps[0]] + cols[comps[1]])
+    df = br.augment(result)
+    chunks = list(br.lmfit.lmfit.iter_augment_lmfit(result, chunksize=10))
+    assert len(chunks) == 5
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+
+def test_tidy_brute_grid():
+    params = lmfit.Parameters()
+    params.add('a', 0, min=-1, max=1, brute_step=0.5)
+    params.add('b', 0, min=-1, max=1, brute_step=0.25)
+    result = lmfit.minimize(lambda p: np.array([p['a'] - 0.3, p['b']]),
+                            params, method='brute')
+    df = br.tidy(result, what='grid')
+    assert list(df.columns) == ['a', 'b', 'fun']
+    assert len(df) == result.brute_Jout.size
+    np.testing.assert_allclose(df['fun'], (df['a'] - 0.3)**2 + df['b']**2)
+
+
+def test_futures():
+    from concurrent.futures import ThreadPoolExecutor
+    datasets = {'a': y, 'b': 2 * y, 'c': 3 * y}
+    results = {k: model1.fit(v, x=x) for k, v in datasets.items()}
+    with ThreadPoolExecutor(2) as pool:
+        futures = {k: pool.submit(model1.fit, v, x=x)
+                   for k, v in datasets.items()}
+        futures['b'] = results['b']   # mixed with ready results
+        df = br.glance(futures)
+        dfs = br.tidy({'f': [futures['a'], futures['c']]},
+                      var_names=['k1', 'k2'])
+        single = br.augment(futures['c'])
+    pd.testing.assert_frame_equal(df, br.glance(results))
+    pd.testing.assert_frame_equal(
+        dfs, br.tidy({'f': [results['a'], results['c']]},
+                     var_names=['k1', 'k2']))
+    pd.testing.assert_frame_equal(single, br.augment(results['c']))
+
+
+def test_futures_batch():
+    from concurrent.futures import ThreadPoolExecutor
+    from pybroom.pybroom import _tidy_many
+    datasets = {'a': y, 'b': 2 * y, 'c': 3 * y}
+    results = {k: model1.fit(v, x=x) for k, v in datasets.items()}
+    original = _tidy_many.dispatch(lmfit.model.ModelResult)
+    calls = []
+
+    def spy(result, results, **kwargs):
+        calls.append(len(results))
+        return original(result, results, **kwargs)
+
+    _tidy_many.register(lmfit.model.ModelResult, spy)
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            futures = {k: pool.submit(model1.fit, v, x=x)
+                       for k, v in datasets.items()}
+            df = br.tidy(futures, output='dict')
+    finally:
+        _tidy_many.register(lmfit.model.ModelResult, original)
+    # Same batch path (and output) of the resolved results
+    assert calls == [3]
+    expected = br.tidy(results, output='dict')
+    assert list(df) == list(expected)
+    for name in expected:
+        np.testing.assert_array_equal(df[name], expected[name])
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import lmfit
+
+import pybroom as br
+
+N = 30
+x = np.linspace(-10, 10, N)
+random_state = np.random.RandomState(123)
+datasets = {'d%d' % i: x * i + random_state.randn(N)/3 + 3 for i in range(5)}
+
+model = lmfit.models.LinearModel()
+params = model.make_params(slope=1, intercept=0)
+
+
+def test_fit_many_matches_results():
+    out = br.fit_many(model, datasets, params, what=('glance', 'tidy'),
+                      fit_kws={'x': x}, var_names='dataset', chunksize=2)
+    results = {k: model.fit(y, params, x=x) for k, y in datasets.items()}
+    expected = br.tidy(results, var_names='dataset')
+    pd.testing.assert_frame_equal(out['tidy'], expected)
+    assert len(out['glance']) == len(datasets)
+    assert list(out['glance']['dataset']) == sorted(datasets)
+
+
+def test_fit_many_processes():
+    data = list(datasets.values())
+    serial = br.fit_many(model, data, params, what='augment',
+                         fit_kws={'x': x})
+    parallel = br.fit_many(model, data, params, what='augment',
+                           fit_kws={'x': x}, n_jobs=2, chunksize=2)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert len(parallel) == N * len(data)
+
+
+def test_iter_fit_many():
+    data = [(y, {'x': x}) for y in datasets.values()]
+    chunks = list(br.iter_fit_many(model, data, params, what=['glance'],
+                                   chunksize=2))
+    assert len(chunks) == 3
+    df = pd.concat([c['glance'] for c in chunks], ignore_index=True)
+    assert list(df['key']) == list(range(len(data)))
+
+
+def test_fit_many_array():
+    data = np.vstack(list(datasets.values()))
+    out = br.fit_many(model, data, params, what='tidy', fit_kws={'x': x})
+    expected = br.fit_many(model, list(data), params, what='tidy',
+                           fit_kws={'x': x})
+    pd.testing.assert_frame_equal(out, expected)
+    with pytest.raises(ValueError):
+        br.fit_many(model, data[0], params, fit_kws={'x': x})
+
+
+def test_iter_fit_many_backpressure(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from pybroom import pipeline
+
+    submitted = []
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, *args, **kwargs):
+            submitted.append(args)
+            return super().submit(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, 'ProcessPoolExecutor', Executor)
+    data = list(datasets.values()) * 4
+    chunks = br.iter_fit_many(model, data, params, what='glance',
+                              fit_kws={'x': x}, n_jobs=2, chunksize=1)
+    next(chunks)
+    assert len(submitted) == 2 * 2
+    assert len(list(chunks)) == len(data) - 1
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import pytest
+import lmfit
+
+import pybroom as br
+
+N = 20
+x = np.linspace(-10, 10, N)
+random_state = np.random.RandomState(123)
+y = x + random_state.randn(N)/3 + 3
+
+model = lmfit.models.LinearModel()
+res1 = model.fit(y, x=x)
+res2 = model.fit(y + 1, x=x)
+
+
+def test_dict_key_categorical():
+    df = br.glance({'b': res1, 'a': res2}, var_names='fit')
+    assert isinstance(df['fit'].dtype, pd.CategoricalDtype)
+    assert df['fit'].cat.ordered
+    assert list(df['fit'].cat.categories) == ['a', 'b']
+    assert list(df['fit']) == ['b', 'a']
+
+
+def test_list_key_int():
+    df = br.tidy([res1, res2, res1], var_names='dataset')
+    assert df['dataset'].dtype == np.int64
+    assert list(df['dataset'].unique()) == [0, 1, 2]
+
+
+def test_nested_keys():
+    results = {'A': {'x': res1, 'y': res2}, 'B': {'y': res1}}
+    df = br.augment(results, var_names=['outer', 'inner'])
+    assert list(df.columns[-2:]) == ['inner', 'outer']
+    assert isinstance(df['inner'].dtype, pd.CategoricalDtype)
+    assert list(df['inner'].cat.categories) == ['x', 'y']
+    assert len(df) == 3 * N
+    assert (df['outer'] == 'B').sum() == N
+
+
+def test_as_index():
+    results = {'A': [res1, res2], 'B': [res2]}
+    df = br.tidy(results, var_names=['model', 'dataset'], as_index=True)
+    assert isinstance(df.index, pd.MultiIndex)
+    assert df.index.names == ['model', 'dataset']
+    assert 'model' not in df.columns
+    assert len(df.loc[('A', 1)]) == len(br.tidy(res2))
+
+
+def test_var_names_too_short():
+    with pytest.raises(ValueError):
+        br.glance({'A': [res1, res2]}, var_names='model')
+
+
+def test_output_numpy_keys():
+    results = {'A': [res1, res2], 'B': [res2]}
+    df = br.glance(results, var_names=['model', 'dataset'])
+    arr = br.glance(results, var_names=['model', 'dataset'], output='numpy')
+    assert arr.dtype.names == tuple(df.columns)
+    assert list(arr['model']) == list(df['model'])
+    assert list(arr['dataset']) == list(df['dataset'])
+    np.testing.assert_allclose(arr['chisqr'], df['chisqr'])
+
+
+def test_output_records():
+    records = br.tidy([res1, res2], output='records')
+    assert len(records) == 4
+    assert records[-1]['key'] == 1
+    assert records[0]['name'] == 'intercept'
+
+
+def test_output_invalid():
+    with pytest.raises(ValueError):
+        br.tidy([res1], output='xarray')
+    with pytest.raises(ValueError):
+        br.tidy([res1], output='numpy', as_index=True)
+
+
+def test_compact():
+    results = [res1, res2] * 10
+    df = br.tidy(results)
+    dfc = br.tidy(results, compact=True)
+    assert list(dfc.columns) == list(df.columns)
+    assert isinstance(dfc['name'].dtype, pd.CategoricalDtype)
+    assert dfc['vary'].dtype == 'boolean'
+    assert dfc['value'].dtype == np.float64
+    assert list(dfc['name']) == list(df['name'])
+    assert (dfc['key'] == df['key']).all()
+    dff = br.glance(results, compact='float32')
+    assert dff['chisqr'].dtype == np.float32
+    assert isinstance(dff['message'].dtype, pd.CategoricalDtype)
+    with pytest.raises(ValueError):
+        br.tidy(res1, compact='float16')
+
+
+def test_tidy_wide():
+    results = {'A': res1, 'B': res2}
+    df = br.tidy(results, var_names='fit', layout='wide')
+    long = br.tidy(results, var_names='fit')
+    assert list(df.columns) == ['intercept', 'intercept_stderr',
+                                'slope', 'slope_stderr', 'fit']
+    pivot = long.pivot(index='fit', columns='name', values='value')
+    np.testing.assert_allclose(df['slope'], pivot['slope'])
+    with pytest.raises(ValueError):
+        br.tidy(results, layout='tall')
+
+
+def test_tidy_wide_union():
+    res3 = lmfit.models.QuadraticModel().fit(y, x=x)
+    df = br.tidy([res1, res3], layout='wide', fields=['value'])
+    assert list(df.columns) == ['intercept', 'slope', 'a', 'b', 'c', 'key']
+    assert np.isnan(df.loc[0, 'a']) and np.isnan(df.loc[1, 'slope'])
+
+
+def test_series_multiindex():
+    index = pd.MultiIndex.from_product([['a', 'b'], [1, 2]],
+                                       names=['group', 'rep'])
+    results = pd.Series([res1, res2, res2, res1], index=index)
+    df = br.tidy(results)
+    assert list(df.columns[-2:]) == ['rep', 'group']
+    assert isinstance(df['group'].dtype, pd.CategoricalDtype)
+    assert df['rep'].dtype == np.int64
+    assert list(df['rep'][::2]) == [1, 2, 1, 2]
+    dfi = br.glance(results, as_index=True)
+    assert dfi.index.equals(index)
+    with pytest.raises(ValueError):
+        br.glance(results, var_names='group')
+
+
+def test_object_ndarray():
+    results = np.empty((2, 3), dtype=object)
+    results[:] = [[res1, res2, res1], [res2, res1, res2]]
+    df = br.glance(results, var_names=['row', 'col'])
+    assert len(df) == 6
+    assert list(df['row']) == [0, 0, 0, 1, 1, 1]
+    assert list(df['col']) == [0, 1, 2, 0, 1, 2]
+
+
+def test_fit_record():
+    import pickle
+    record = pickle.loads(pickle.dumps(br.FitRecord(res1)))
+    pd.testing.assert_frame_equal(br.tidy(record), br.tidy(res1))
+    pd.testing.assert_frame_equal(br.glance([record, record]),
+                                  br.glance([res1, res1]))
+    assert len(pickle.dumps(record)) < len(pickle.dumps(res1)) / 2
+    with pytest.raises(NotImplementedError):
+        br.augment(record)
+
+
+def test_fit_record_kwargs():
+    record = br.FitRecord(res1, what='covariance')
+    pd.testing.assert_frame_equal(br.tidy(record),
+                                  br.tidy(res1, what='covariance'))
+    with pytest.raises(ValueError, match='FitRecord'):
+        br.tidy(br.FitRecord(res1), what='covariance')
+    with pytest.raises(ValueError, match='conf_int'):
+        br.tidy([record, record], conf_int=0.95)
+    # Arguments handled by `tidy` itself are supported
+    df = br.tidy([br.FitRecord(res1), br.FitRecord(res1)], layout='wide')
+    assert len(df) == 2
+
+
+def test_decimation_index_peaks():
+    from pybroom.utils import decimation_index
+    xx = np.linspace(0, 10, 10001)
+    yy = np.sin(xx)
+    yy[3333] = 5
+    for method in ('minmax', 'lttb'):
+        index = decimation_index(yy, xx, max_points=100, method=method)
+        assert len(index) <= 100
+        assert 3333 in index
+    assert decimation_index(yy, max_points=20000) is None
+    with pytest.raises(ValueError):
+        decimation_index(yy, stride=10, method='lttb')
+    for stride in (0, -2):
+        with pytest.raises(ValueError, match='stride'):
+            decimation_index(yy, stride=stride)
+    assert decimation_index(yy, stride=1) is None
+    for method, max_points in (('minmax', 1), ('lttb', 2)):
+        with pytest.raises(ValueError):
+            decimation_index(yy, max_points=max_points, method=method)
+    for max_points in (3, 4, 7):
+        index = decimation_index(yy, xx, max_points=max_points,
+                                 method='lttb')
+        assert len(index) <= max_points
+        assert index[0] == 0 and index[-1] == len(yy) - 1
@@ -1,5 +1,8 @@
 import numpy as np
+import pytest
 from scipy.optimize import least_squares
+import pybroom as br
+from pybroom import tidy, augment, covariance_array
 
 from .conftest import BaseTest
 
@@ -35,3 +38,167 @@ class TestOptimizeDict(BaseTest):
     n = {'m1': N, 'm2': N}
     result = {'m1': ls_res1,
               'm2': ls_res2}
+
+
+def test_tidy_covariance():
+    df = tidy(ls_res1, what='covariance', param_names='a b')
+    assert list(df.columns) == ['param_i', 'param_j', 'cov', 'corr']
+    assert list(df.param_i) == ['a', 'a', 'b']
+    assert list(df.param_j) == ['a', 'b', 'b']
+    J = ls_res1.jac
+    s_sq = np.sum(ls_res1.fun**2) / (N - 2)
+    cov = np.linalg.inv(J.T @ J) * s_sq
+    np.testing.assert_allclose(df['cov'], cov[np.triu_indices(2)])
+    cov_array, names = covariance_array([ls_res1, ls_res2])
+    assert cov_array.shape == (2, 2, 2)
+    assert names == ['p0', 'p1']
+    np.testing.assert_allclose(cov_array[0], cov)
+
+
+def test_tidy_stderr():
+    df = tidy(ls_res1, param_names='a b')
+    cov = tidy(ls_res1, what='covariance', param_names='a b')
+    diag = cov[cov.param_i == cov.param_j]
+    np.testing.assert_allclose(df['stderr'], np.sqrt(diag['cov']))
+    # Batched stderr on a collection matches the single result
+    dfl = tidy([ls_res1, ls_res2, ls_res1], param_names='a b')
+    np.testing.assert_allclose(dfl['stderr'][:2], df['stderr'])
+    np.testing.assert_allclose(dfl['stderr'][4:], df['stderr'])
+
+
+def test_augment():
+    df = augment(ls_res1, x=x, data=y, leverage=True)
+    assert list(df.columns) == ['x', 'data', 'residual', 'leverage']
+    np.testing.assert_array_equal(df['residual'], ls_res1.fun)
+    J = ls_res1.jac
+    hat = J @ np.linalg.inv(J.T @ J) @ J.T
+    np.testing.assert_allclose(df['leverage'], np.diag(hat))
+    dfl = augment({'r1': ls_res1, 'r2': ls_res2}, x=x, leverage=True)
+    assert len(dfl) == 2 * N
+    np.testing.assert_allclose(dfl.loc[dfl.key == 'r1', 'leverage'],
+                               df['leverage'])
+    np.testing.assert_array_equal(dfl.loc[dfl.key == 'r2', 'residual'],
+                                  ls_res2.fun)
+    # Scalar objective values are not residuals
+    from scipy.optimize import minimize
+    min_res = minimize(lambda p: np.sum(residuals(p, x, y)**2), x0)
+    with pytest.raises(ValueError):
+        augment(min_res)
+    with pytest.raises(ValueError):
+        augment([ls_res1, min_res])
+
+
+def test_curve_fit():
+    from scipy.optimize import curve_fit
+    from pybroom.scipy.curve_fit import CurveFitResult
+
+    def line(x, b, a):
+        return a * x + b
+
+    res1 = CurveFitResult(*curve_fit(line, x, y))
+    res2 = CurveFitResult(*curve_fit(line, x, 2 * y, full_output=True))
+    df = tidy(res1, param_names='b a')
+    assert list(df.columns) == ['name', 'value', 'stderr']
+    assert list(df['name']) == ['a', 'b']
+    np.testing.assert_allclose(df['value'], res1.popt[::-1])
+    np.testing.assert_allclose(df['stderr'],
+                               np.sqrt(np.diag(res1.pcov))[::-1])
+    dfl = tidy([res1, res2], param_names='b a')
+    assert len(dfl) == 4
+    np.testing.assert_allclose(dfl['stderr'][:2], df['stderr'])
+    np.testing.assert_allclose(dfl['stderr'][2:],
+                               tidy(res2, param_names='b a')['stderr'])
+    cov = tidy(res2, what='covariance')
+    assert cov['cov'][0] == res2.pcov[0, 0]
+    glance = br.glance([res1, res2])
+    assert glance['num_params'].tolist() == [2, 2]
+    assert glance['success'][1]
+    assert glance['num_data_points'][1] == N
+
+
+def test_tidy_sparse():
+    from scipy.optimize import linprog
+    n = 1000
+    c = np.ones(n)
+    c[[10, 500]] = -1
+    res = linprog(c, A_ub=np.ones((1, n)), b_ub=[3], bounds=(0, 2))
+    df = tidy(res, sparse=True, tol=1e-9)
+    assert list(df.columns) == ['name', 'index', 'value']
+    assert list(df['index']) == list(np.flatnonzero(np.abs(res.x) > 1e-9))
+    assert list(df['name']) == ['p%d' % i for i in df['index']]
+    names = np.array(['v%04d' % i for i in range(n)])
+    df = tidy(res, sparse=True, param_names=names)
+    assert list(df['name']) == list(names[df['index']])
+    dfl = tidy([res, res], sparse=True, output='dict')
+    assert len(dfl['name']) == 2 * len(df)
+    duals = tidy(res, what='duals')
+    assert set(duals.constraint) == {'ineqlin', 'lower', 'upper'}
+    assert len(duals[duals.constraint == 'lower']) == n
+    sparse_duals = tidy(res, what='duals', sparse=True)
+    assert (sparse_duals['marginal'] != 0).all()
+    lower = duals[duals.constraint == 'lower']
+    assert len(sparse_duals[sparse_duals.constraint == 'lower']) == \
+        np.count_nonzero(lower['marginal'])
+
+
+def test_tidy_stderr_hess_inv():
+    from scipy.optimize import minimize, OptimizeResult
+    from scipy.sparse.linalg import aslinearoperator
+    from pybroom.scipy.optimize import _hess_inv_diagonal
+
+    def nll(p):
+        return 0.5 * np.sum(residuals(p, x, y)**2)
+
+    res_bfgs = minimize(nll, x0, method='BFGS')
+    df = tidy(res_bfgs)
+    np.testing.assert_allclose(df['stderr'],
+                               np.sqrt(np.diag(res_bfgs.hess_inv)))
+    res_lbfgs = minimize(nll, x0, method='L-BFGS-B')
+    df = tidy([res_lbfgs, res_bfgs])
+    np.testing.assert_allclose(df['stderr'][:2],
+                               np.sqrt(np.diag(res_lbfgs.hess_inv.todense())))
+    rng = np.random.RandomState(1)
+    A = rng.randn(50, 50)
+    A = A @ A.T + 50 * np.eye(50)
+    op = aslinearoperator(A)
+    np.testing.assert_allclose(_hess_inv_diagonal(op), np.diag(A))
+
+    # Stochastic estimate with fewer probes than parameters: the error of
+    # each element has std sqrt(sum_j!=i A_ij^2 / n_probes)
+    n, n_probes = 200, 40
+    B = rng.randn(n, n)
+    A = B @ B.T / n + np.diag(rng.uniform(1, 2, n))
+    op = aslinearoperator(A)
+    approx = _hess_inv_diagonal(op, max_matvecs=n_probes)
+    assert not np.allclose(approx, np.diag(A))
+    sigma = np.sqrt((np.sum(A**2, axis=1) - np.diag(A)**2) / n_probes)
+    assert np.all(np.abs(approx - np.diag(A)) < 5 * sigma)
+    # Through tidy()
+    res = OptimizeResult(x=np.zeros(n), fun=0., hess_inv=op)
+    df = tidy(res, hess_inv_max_matvecs=n_probes)
+    names = np.array(['p%d' % i for i in range(n)])
+    index = np.argsort(names, kind='stable')
+    np.testing.assert_allclose(df['stderr'], np.sqrt(approx[index]))
+    df = tidy(res)
+    np.testing.assert_allclose(df['stderr'], np.sqrt(np.diag(A)[index]))
+
+
+def test_tidy_population_grid():
+    from scipy.optimize import brute, differential_evolution, OptimizeResult
+
+    def sq(p):
+        return np.sum((p - [0.3, -0.2])**2)
+
+    res = differential_evolution(sq, [(-1, 1)] * 2, maxiter=3, seed=0)
+    df = tidy(res, what='population', param_names='a b')
+    assert list(df.columns) == ['member', 'a', 'b', 'energy']
+    np.testing.assert_array_equal(df[['a', 'b']], res.population)
+    np.testing.assert_array_equal(df['energy'], res.population_energies)
+    x0, fval, grid, Jout = brute(sq, [(-1, 1, 0.5)] * 2, full_output=True,
+                                 finish=None)
+    res = OptimizeResult(x=x0, fun=fval, grid=grid, Jout=Jout)
+    df = tidy(res, what='grid', param_names='a b')
+    assert list(df.columns) == ['a', 'b', 'fun']
+    assert len(df) == Jout.size
+    np.testing.assert_allclose(df['fun'], [sq(p) for p in df[['a', 'b']]
+                                           .values])
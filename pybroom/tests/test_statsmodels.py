@@ -3,6 +3,7 @@ import pandas as pd
 import statsmodels.api as sm
 import statsmodels.formula.api as smf
 
+from pybroom import augment
 from .conftest import BaseTest
 
 N = 50
@@ -16,3 +17,11 @@ model = smf.ols('y ~ x', data=df)
 class TestOneModel(BaseTest):
     n = N
     result = model.fit()
+
+
+def test_augment_decimation():
+    result = model.fit()
+    df = augment(result, max_points=10, method='minmax')
+    assert len(df) <= 10
+    assert df['y'].max() == y.max()
+    assert df['y'].min() == y.min()
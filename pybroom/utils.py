@@ -1,6 +1,19 @@
+from collections import OrderedDict
+import os
+import numpy as np
 import pandas as pd
 
 
+#: Output types accepted by the `output` argument of the tidying functions.
+OUTPUTS = ('dataframe', 'numpy', 'records', 'dict')
+
+#: Columns converted to categorical in compact mode.
+COMPACT_CATEGORICAL = ('name', 'expr', 'method', 'message', 'model')
+
+#: Columns converted to nullable booleans in compact mode.
+COMPACT_BOOLEAN = ('vary', 'success')
+
+
 def tidy_to_dict(df, key='name', value='value', keys_exclude=None,
                  cast_value=float):
     """Convert a tidy DataFrame into a dictionary.
@@ -89,3 +102,355 @@ def _test_dict_to_tidy(dc, key='name', value='value', keys_exclude=None,
     # Test compliance
     assert all(df == dict_to_tidy(dc, key, value, keys_exclude, value_type))
     return df
+
+
+def _check_output(output):
+    if output not in OUTPUTS:
+        msg = '`output` must be one of %s, not %r.'
+        raise ValueError(msg % (', '.join(OUTPUTS), output))
+
+
+def _as_what_list(what):
+    """Return `what` as a list of names of tidying functions."""
+    what_list = [what] if isinstance(what, str) else list(what)
+    for name in what_list:
+        if name not in ('glance', 'tidy', 'augment'):
+            msg = "`what` items must be 'glance', 'tidy' or 'augment', not %r."
+            raise ValueError(msg % (name,))
+    return what_list
+
+
+def _n_workers(n_jobs):
+    """Number of worker processes for the `n_jobs` argument.
+
+    Negative values are relative to the number of CPUs (-1 means all the
+    CPUs), None or 0 mean a single process.
+    """
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return n_jobs
+
+
+def _check_compact(compact):
+    if compact not in (False, True, 'float32'):
+        msg = "`compact` must be True, False or 'float32', not %r."
+        raise ValueError(msg % (compact,))
+
+
+def compact_columns(columns, compact=True):
+    """Convert columns to memory-lean types.
+
+    Arguments:
+        columns (OrderedDict): the columns to convert (lists or 1-D arrays).
+        compact (bool or string): if True, columns in
+            :data:`COMPACT_CATEGORICAL` become `pandas.Categorical` and
+            columns in :data:`COMPACT_BOOLEAN` become nullable booleans.
+            If `'float32'`, float64 columns are also downcast to float32.
+
+    Returns:
+        A new OrderedDict with the converted columns.
+    """
+    _check_compact(compact)
+    compacted = OrderedDict()
+    for name, col in columns.items():
+        if isinstance(col, pd.Categorical):
+            pass
+        elif name in COMPACT_CATEGORICAL:
+            col = pd.Categorical(np.asarray(col, dtype=object))
+        elif name in COMPACT_BOOLEAN:
+            col = pd.array(np.asarray(col, dtype=object), dtype='boolean')
+        elif compact == 'float32' and np.asarray(col).dtype == np.float64:
+            col = np.asarray(col, dtype=np.float32)
+        compacted[name] = col
+    return compacted
+
+
+def _build_output(columns, output='dataframe', compact=False):
+    """Build the requested output type from a dict of columns.
+
+    This is the last step of all the specialized tidying functions, which
+    extract data from a fit result into an (ordered) dict of columns
+    (lists or 1-D arrays of the same length).
+
+    Arguments:
+        columns (OrderedDict): the columns of the output, in order.
+        output (string): the output type. Valid values are
+            `'dataframe'` (a `pandas.DataFrame`), `'numpy'` (a NumPy
+            structured array), `'records'` (a list of dicts, one per row)
+            and `'dict'` (an OrderedDict of 1-D arrays).
+        compact (bool or string): if not False, convert the columns with
+            :func:`compact_columns`. Only float downcasting applies to
+            non-DataFrame outputs.
+
+    Returns:
+        The columns converted to the type specified by `output`.
+    """
+    _check_output(output)
+    _check_compact(compact)
+    if output == 'dataframe':
+        if compact:
+            columns = compact_columns(columns, compact)
+        return pd.DataFrame(columns, columns=list(columns))
+    if compact == 'float32':
+        columns = OrderedDict(
+            (name, np.asarray(col, dtype=np.float32)
+             if np.asarray(col).dtype == np.float64 else col)
+            for name, col in columns.items())
+    columns = OrderedDict((name, np.asarray(col))
+                          for name, col in columns.items())
+    if output == 'dict':
+        return columns
+    elif output == 'records':
+        names = list(columns)
+        rows = zip(*(col.tolist() for col in columns.values()))
+        return [dict(zip(names, row)) for row in rows]
+    n = len(next(iter(columns.values()))) if columns else 0
+    dtype = [(name, col.dtype) for name, col in columns.items()]
+    arr = np.empty(n, dtype=dtype)
+    for name, col in columns.items():
+        arr[name] = col
+    return arr
+
+
+def _concat_columns(columns_list):
+    """Concatenate a list of dict of columns in a single dict of columns.
+
+    Columns missing in some of the inputs are filled with None.
+    """
+    names = OrderedDict()
+    for columns in columns_list:
+        names.update(OrderedDict.fromkeys(columns))
+    lengths = [len(next(iter(c.values()))) if c else 0 for c in columns_list]
+    merged = OrderedDict()
+    for name in names:
+        pieces = []
+        for columns, n in zip(columns_list, lengths):
+            if name in columns:
+                pieces.append(np.asarray(columns[name]))
+            else:
+                pieces.append(np.full(n, None, dtype=object))
+        if any(p.dtype == object for p in pieces):
+            pieces = [p.astype(object) for p in pieces]
+        merged[name] = np.concatenate(pieces)
+    return merged
+
+
+def _covariance_columns(param_names, cov):
+    """Long-form columns for the upper triangle (with diagonal) of `cov`.
+
+    Returns:
+        An OrderedDict with columns `param_i`, `param_j`, `cov` and `corr`.
+    """
+    i, j = np.triu_indices(len(param_names))
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov[i, j] / (std[i] * std[j])
+    names = np.empty(len(param_names), dtype=object)
+    names[:] = list(param_names)
+    return OrderedDict([('param_i', names[i]), ('param_j', names[j]),
+                        ('cov', cov[i, j]), ('corr', corr)])
+
+
+def _covariance_from_jac(jac, fun):
+    """Covariance of the parameters from the Jacobian of the residuals.
+
+    The covariance ``s^2 (J^T J)^-1``, where ``s^2`` is the residual
+    variance, is computed from the SVD of `jac`. Singular values smaller
+    than ``eps * max(m, n) * s_max`` are discarded (as in
+    `scipy.optimize.curve_fit`). It also works on stacked arrays of
+    problems with the same size: `jac` with shape `(..., m, n)` and `fun`
+    with shape `(..., m)`.
+    """
+    jac, fun = np.asarray(jac, dtype=float), np.asarray(fun, dtype=float)
+    _, s, VT = np.linalg.svd(jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(jac.shape[-2:]) * s[..., :1]
+    with np.errstate(divide='ignore'):
+        inv_s2 = np.where(s > threshold, 1 / s**2, 0)
+    cov = np.einsum('...ki,...k,...kj->...ij', VT, inv_s2, VT)
+    m, n = jac.shape[-2:]
+    if m > n:
+        s_sq = np.sum(fun**2, axis=-1) / (m - n)
+    else:
+        s_sq = np.full(fun.shape[:-1], np.nan)
+    return cov * np.asarray(s_sq)[..., None, None]
+
+
+def _leverage_from_jac(jac):
+    """Leverage (diagonal of the hat matrix) of each point from the Jacobian.
+
+    The hat matrix ``J (J^T J)^-1 J^T`` is ``U U^T`` where `U` are the left
+    singular vectors of `jac` with singular values above the threshold
+    used in :func:`_covariance_from_jac`. Works on stacked arrays of
+    Jacobians with shape `(..., m, n)`, returning shape `(..., m)`.
+    """
+    jac = np.asarray(jac, dtype=float)
+    U, s, _ = np.linalg.svd(jac, full_matrices=False)
+    threshold = np.finfo(float).eps * max(jac.shape[-2:]) * s[..., :1]
+    return np.einsum('...ik,...k->...i', U**2, (s > threshold).astype(float))
+
+
+def _grid_columns(grid, Jout, param_names, fun='fun'):
+    """Long-form columns of a brute-force grid, one row per grid point.
+
+    Arguments:
+        grid (array): parameter values on the grid, with shape
+            `(n_params, n1, n2, ...)` or `(n1,)` for a single parameter
+            (as returned by `scipy.optimize.brute`).
+        Jout (array): objective function on the grid, shape `(n1, n2, ...)`.
+        param_names (list): names of the parameters (grid axes).
+        fun (string): name of the column with the values of `Jout`.
+
+    Returns:
+        An OrderedDict with a column for each parameter and the column
+        `fun`. Columns are raveled views of `grid` and `Jout` when they
+        are contiguous.
+    """
+    grid, Jout = np.asarray(grid), np.asarray(Jout)
+    if grid.ndim == Jout.ndim:
+        grid = grid[None]
+    columns = OrderedDict((name, values.ravel())
+                          for name, values in zip(param_names, grid))
+    columns[fun] = Jout.ravel()
+    return columns
+
+
+def _point_arrays(arrays, size):
+    """Ravel the (optional) per-point arrays passed by the user.
+
+    Arguments:
+        arrays (OrderedDict): arrays (e.g. `x` and `data`) by column name.
+            Items whose value is None are skipped.
+        size (int): number of points (e.g. the size of the residual).
+
+    Returns:
+        An OrderedDict of 1D arrays (views when possible).
+    """
+    columns = OrderedDict()
+    for name, values in arrays.items():
+        if values is None:
+            continue
+        values = np.asarray(values).ravel()
+        if values.size != size:
+            msg = '`%s` has %d elements but the residual has %d.'
+            raise ValueError(msg % (name, values.size, size))
+        columns[name] = values
+    return columns
+
+
+def _stack_point_arrays(arrays, lengths):
+    """Per-point arrays for a collection of results with `lengths` points.
+
+    Each array in `arrays` is either 1D, shared by all the results, or 2D
+    with one row per result. See :func:`_point_arrays`.
+    """
+    columns = OrderedDict()
+    for name, values in arrays.items():
+        if values is None:
+            continue
+        values = np.asarray(values)
+        if values.ndim == 1:
+            if not (lengths == values.size).all():
+                msg = '`%s` has %d elements but not all residuals do.'
+                raise ValueError(msg % (name, values.size))
+            columns[name] = np.tile(values, len(lengths))
+        elif values.shape[0] == len(lengths):
+            columns[name] = np.concatenate(
+                [_point_arrays({name: row}, n)[name]
+                 for row, n in zip(values, lengths)])
+        else:
+            msg = '`%s` must be 1D or have one row per result.'
+            raise ValueError(msg % name)
+    return columns
+
+
+#: Methods accepted by :func:`decimation_index`.
+DECIMATION_METHODS = ('uniform', 'minmax', 'lttb')
+
+
+def _bucket_rows(values, n_buckets, fill):
+    """Reshape `values` in (at most) `n_buckets` rows of equal size.
+
+    The last row is padded with `fill`. No row is only padding, so the
+    number of rows may be smaller than `n_buckets`.
+    """
+    size = -(-len(values) // n_buckets)
+    n_rows = -(-len(values) // size)
+    padded = np.full(n_rows * size, fill, dtype=float)
+    padded[:len(values)] = values
+    return padded.reshape(n_rows, size), size
+
+
+def decimation_index(y, x=None, max_points=None, stride=None,
+                     method='uniform'):
+    """Return the indices of the rows to keep to decimate `y`.
+
+    Arguments:
+        y (array): the values (e.g. the fitted data) used to select the
+            rows preserving peaks (methods `'minmax'` and `'lttb'`).
+        x (array or None): the x coordinates of `y`, used by `'lttb'`.
+            If None, the index of `y` is used.
+        max_points (int or None): maximum number of rows to keep.
+        stride (int or None): keep one row every `stride` rows (1 keeps
+            all the rows). Only valid with `method='uniform'` and when
+            `max_points` is None.
+        method (string): the decimation method. `'uniform'` selects equally
+            spaced rows. `'minmax'` splits the rows in `max_points // 2`
+            buckets and keeps the minimum and maximum of `y` in each bucket.
+            `'lttb'` uses the Largest-Triangle-Three-Buckets algorithm,
+            keeping in each bucket the point forming the largest triangle
+            with the averages of the previous and of the next bucket
+            (all the buckets are processed at once, so the first vertex
+            is the average of the previous bucket instead of the point
+            selected in it). `max_points` must be at least 2 for
+            `'minmax'` and 3 for `'lttb'`.
+
+    Returns:
+        A sorted array of row indices, or None if no decimation is needed.
+    """
+    if method not in DECIMATION_METHODS:
+        msg = '`method` must be one of %s, not %r.'
+        raise ValueError(msg % (', '.join(DECIMATION_METHODS), method))
+    if stride is not None:
+        if max_points is not None or method != 'uniform':
+            msg = "`stride` requires `method='uniform'` and no `max_points`."
+            raise ValueError(msg)
+        if stride < 1:
+            raise ValueError('`stride` must be at least 1, not %r.' % stride)
+        return np.arange(0, len(y), stride) if stride > 1 else None
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return None
+    min_points = {'uniform': 1, 'minmax': 2, 'lttb': 3}[method]
+    if max_points < min_points:
+        msg = '`max_points` must be at least %d with `method=%r`.'
+        raise ValueError(msg % (min_points, method))
+    if method == 'uniform':
+        return np.unique(np.linspace(0, n - 1, max_points).round()
+                         .astype(np.intp))
+    y = np.asarray(y, dtype=float)
+    if method == 'minmax':
+        n_buckets = max_points // 2
+        lo, size = _bucket_rows(y, n_buckets, np.inf)
+        hi, _ = _bucket_rows(y, n_buckets, -np.inf)
+        starts = np.arange(len(lo)) * size
+        index = np.concatenate((starts + np.argmin(lo, axis=1),
+                                starts + np.argmax(hi, axis=1)))
+        return np.unique(index[index < n])
+    # LTTB: first and last points are always kept
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, float)
+    ys, size = _bucket_rows(y[1:-1], max_points - 2, np.nan)
+    xs, _ = _bucket_rows(x[1:-1], max_points - 2, np.nan)
+    x_mean, y_mean = np.nanmean(xs, axis=1), np.nanmean(ys, axis=1)
+    # Vertices of the triangles: average of the previous bucket (first
+    # point for the first bucket) and of the next bucket (last point)
+    x_prev = np.append(x[0], x_mean[:-1])[:, None]
+    y_prev = np.append(y[0], y_mean[:-1])[:, None]
+    x_next = np.append(x_mean[1:], x[-1])[:, None]
+    y_next = np.append(y_mean[1:], y[-1])[:, None]
+    area = np.abs((x_prev - x_next) * (ys - y_prev) -
+                  (x_prev - xs) * (y_next - y_prev))
+    index = (1 + np.arange(len(ys)) * size +
+             np.argmax(np.nan_to_num(area, nan=-1), axis=1))
+    return np.concatenate(([0], index, [n - 1])).astype(np.intp)